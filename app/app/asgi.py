@@ -0,0 +1,17 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Django 2.1 has no native ASGI support, so this serves the WSGI application
+through asgiref's WsgiToAsgi adapter, which runs each request in a thread.
+Serve it with an ASGI worker, e.g.
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \\
+        gunicorn -c gunicorn.conf.py app.asgi:application
+"""
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app.wsgi import application as wsgi_application
+
+application = WsgiToAsgi(wsgi_application)
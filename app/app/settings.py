@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -23,9 +25,13 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = '4o%e9w(cwx=@6d$=l5divwc4-ha&x-&_ua4&wy$j-q5=b&kd@('
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Turned off by setting DJANGO_DEBUG=0, e.g. when running under gunicorn.
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')
+    if host
+]
 
 
 # Application definition
@@ -37,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -45,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that it times everything else.
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +61,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Only active with PROFILING['ENABLED'].
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -78,16 +89,72 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# core.db.backends.postgresql is Django's PostgreSQL backend with health
+# checks for persistent connections and an optional connection pool.
+# DB_POOL_SIZE > 0 shares a pool of connections between the threads of a
+# threaded server, in which case connections go back to the pool at the end
+# of each request and DB_POOL_MAX_AGE replaces CONN_MAX_AGE.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Seconds to keep a connection open between requests, instead of
+        # opening a new one for every request.
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE else int(
+            os.environ.get('DB_CONN_MAX_AGE', 60)
+        ),
+        'CONN_HEALTH_CHECKS': os.environ.get(
+            'DB_CONN_HEALTH_CHECKS', '1'
+        ) == '1',
+        'POOL': {
+            'SIZE': DB_POOL_SIZE,
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            'MAX_AGE': int(os.environ.get('DB_POOL_MAX_AGE', 600)),
+        },
     }
 }
 
+# Caches
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# The 'api' cache holds the cached recipe API responses (see recipe.cache),
+# set API_CACHE_BACKEND to e.g.
+# django.core.cache.backends.filebased.FileBasedCache to share it between
+# processes on the same host (docker-compose.yml does). It has to be shared
+# by every process writing recipes (the gunicorn workers and the
+# process_recipe_images worker), or the others keep serving what they
+# cached before the change, so LocMemCache is only allowed with DEBUG.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': os.environ.get(
+            'API_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('API_CACHE_LOCATION', 'recipe-api'),
+        'TIMEOUT': int(os.environ.get('API_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('API_CACHE_MAX_ENTRIES', 10000)),
+        },
+    },
+}
+
+RECIPE_API_CACHE_ALIAS = 'api'
+
+if not DEBUG and CACHES[RECIPE_API_CACHE_ALIAS]['BACKEND'].endswith(
+    '.LocMemCache'
+):
+    raise ImproperlyConfigured(
+        'Set API_CACHE_BACKEND to a cache shared by all processes.'
+    )
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -106,6 +173,25 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# https://docs.djangoproject.com/en/2.1/topics/auth/passwords/
+# New passwords are hashed with the first hasher. Hashes made by the others
+# (or with another PASSWORD_HASH_ITERATIONS) are upgraded when the user
+# logs in, see core.hashers. PASSWORD_HASHER=argon2 prefers Argon2, which
+# needs argon2-cffi (pip install argon2-cffi). Run the benchmark_hashers
+# management command to see what a hash costs.
+PASSWORD_HASH_ITERATIONS = int(
+    os.environ.get('PASSWORD_HASH_ITERATIONS', 0)
+) or None
+PASSWORD_HASHERS = [
+    'core.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+if os.environ.get('PASSWORD_HASHER') == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(2))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.1/topics/i18n/
@@ -136,3 +222,116 @@ STATIC_ROOT = '/vol/web/static'
 # core is the name of our app and User is the name of the model in our app
 # that we want to assign as custom user model.
 AUTH_USER_MODEL = 'core.User'
+
+# API_FAST_JSON=1 renders and parses JSON with orjson, which must be
+# installed separately (pip install orjson); without it core.renderers and
+# core.parsers fall back to the stdlib json module.
+FAST_JSON = os.environ.get('API_FAST_JSON', '0') == '1'
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer' if FAST_JSON
+        else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.FastJSONParser' if FAST_JSON
+        else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # Number of proxies in front of the app. The throttles use the client
+    # address they added to X-Forwarded-For, or REMOTE_ADDR when it's 0.
+    'NUM_PROXIES': int(os.environ.get('API_NUM_PROXIES', 0)),
+}
+
+# Token buckets of user.throttling, which reject bursts of requests to the
+# token endpoint before any password is hashed. Each bucket holds BURST
+# requests and refills at RATE ('<requests>/<sec|min|hour|day>'). STORE is
+# 'memory' (per process) or 'database' (shared by every process). Without
+# DEBUG it defaults to the database, each gunicorn worker having its own
+# buckets would multiply the allowed rates by the number of workers.
+LOGIN_THROTTLE = {
+    'ENABLED': os.environ.get('LOGIN_THROTTLE', '1') == '1',
+    'STORE': os.environ.get(
+        'LOGIN_THROTTLE_STORE',
+        'memory' if DEBUG else 'database'
+    ),
+    'MAX_SIZE': int(os.environ.get('LOGIN_THROTTLE_MAX_SIZE', 100000)),
+    'IP_BURST': int(os.environ.get('LOGIN_THROTTLE_IP_BURST', 20)),
+    'IP_RATE': os.environ.get('LOGIN_THROTTLE_IP_RATE', '10/min'),
+    'ACCOUNT_BURST': int(os.environ.get('LOGIN_THROTTLE_ACCOUNT_BURST', 5)),
+    'ACCOUNT_RATE': os.environ.get('LOGIN_THROTTLE_ACCOUNT_RATE', '5/min'),
+}
+
+# In-process cache used by core.authentication.CachedTokenAuthentication.
+# Set BACKEND to the alias of one of the CACHES to share it across processes.
+# Without one, each process only sees its own invalidations, so a deleted
+# token keeps working in the other processes (gunicorn workers) until their
+# entry expires after LOCAL_TIMEOUT seconds.
+TOKEN_AUTH_CACHE = {
+    'BACKEND': os.environ.get('TOKEN_AUTH_CACHE_BACKEND'),
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_MAX_SIZE', 1024)),
+    'TIMEOUT': int(os.environ.get('TOKEN_AUTH_CACHE_TIMEOUT', 300)),
+    'LOCAL_TIMEOUT': int(
+        os.environ.get('TOKEN_AUTH_CACHE_LOCAL_TIMEOUT', 5)
+    ),
+}
+
+# Maximum number of objects accepted by the recipe API bulk/ endpoints.
+RECIPE_API_MAX_BATCH_SIZE = int(
+    os.environ.get('RECIPE_API_MAX_BATCH_SIZE', 1000)
+)
+
+# Recipe images are downscaled to fit in a square of this many pixels.
+RECIPE_IMAGE_MAX_SIZE = int(os.environ.get('RECIPE_IMAGE_MAX_SIZE', 2048))
+
+# Seconds after which an image job still being processed is handed to
+# another worker, since the one that claimed it most likely died.
+RECIPE_IMAGE_JOB_TIMEOUT = int(
+    os.environ.get('RECIPE_IMAGE_JOB_TIMEOUT', 600)
+)
+
+# Bounding box sizes of the responsive variants rendered for recipe images.
+RECIPE_IMAGE_VARIANT_SIZES = (128, 512, 1024)
+
+# core.middleware.InstrumentationMiddleware records the wall time, query
+# time and query count of SAMPLE_RATE (0 to 1) of the requests. They're
+# sent in a Server-Timing header, logged as JSON on the api.requests logger
+# with API_REQUEST_LOG=1 and kept as histograms served at /internal/metrics/
+# to METRICS_ALLOWED_IPS.
+INSTRUMENTATION = {
+    'SAMPLE_RATE': float(os.environ.get('API_INSTRUMENTATION_SAMPLE_RATE', 1)),
+    'SERVER_TIMING': os.environ.get('API_SERVER_TIMING', '1') == '1',
+    'LOG': os.environ.get('API_REQUEST_LOG', '0') == '1',
+}
+METRICS_ALLOWED_IPS = os.environ.get(
+    'METRICS_ALLOWED_IPS', '127.0.0.1,::1'
+).split(',')
+
+# core.middleware.ProfilingMiddleware writes sampling profiles (stacks taken
+# every INTERVAL seconds) of the requests of staff users sending an
+# X-Profile: 1 header or ?profile=1, and of SAMPLE_RATE of all requests, to
+# DIRECTORY. List and aggregate them with the profiles management command.
+PROFILING = {
+    'ENABLED': os.environ.get('API_PROFILING', '0') == '1',
+    'SAMPLE_RATE': float(os.environ.get('API_PROFILING_SAMPLE_RATE', 0)),
+    'INTERVAL': float(os.environ.get('API_PROFILING_INTERVAL', 0.005)),
+    'DIRECTORY': os.environ.get('API_PROFILING_DIR', '/tmp/api-profiles'),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('API_REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
@@ -18,8 +18,12 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core import views as core_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Prometheus metrics, only served to METRICS_ALLOWED_IPS.
+    path('internal/metrics/', core_views.metrics, name='metrics'),
     # any URL request that starts with api/user, we're going to pass in
     # user.urls via the include() function.
     path('api/user/', include('user.urls')),
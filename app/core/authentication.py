@@ -0,0 +1,120 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.authentication import TokenAuthentication
+
+
+class LocalTokenCache:
+    # Bounded in-process LRU cache with a time to live for each entry.
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        # Requests can be served from several threads in the same process.
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            # Mark the entry as the most recently used one.
+            self._entries.move_to_end(key)
+        # Like a shared cache, hand out a copy so that a request changing
+        # its user object doesn't change it for every other request.
+        return copy.deepcopy(value)
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            # Evict the least recently used entries once we're over size.
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedTokenCache:
+    # Token cache stored in one of the Django CACHES backends, so that
+    # several processes share entries and invalidations.
+    KEY_PREFIX = 'auth-token:'
+
+    def __init__(self, alias, timeout):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def _cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self._cache.get(self.KEY_PREFIX + key)
+
+    def set(self, key, value):
+        self._cache.set(self.KEY_PREFIX + key, value, self.timeout)
+
+    def delete_many(self, keys):
+        self._cache.delete_many([self.KEY_PREFIX + key for key in keys])
+
+    def clear(self):
+        self._cache.clear()
+
+
+def _build_token_cache():
+    # Build the token cache from the TOKEN_AUTH_CACHE setting
+    config = getattr(settings, 'TOKEN_AUTH_CACHE', {})
+    if config.get('BACKEND'):
+        return SharedTokenCache(config['BACKEND'], config.get('TIMEOUT', 300))
+
+    # Other processes can't invalidate our entries, keep them briefly.
+    return LocalTokenCache(
+        config.get('MAX_SIZE', 1024),
+        config.get('LOCAL_TIMEOUT', 5)
+    )
+
+
+token_cache = _build_token_cache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # Drop-in replacement for TokenAuthentication which remembers the
+    # (user, token) pair for a key, so repeat callers don't cost a
+    # Token -> User join query on every request.
+    '''
+    Note
+    Entries are removed by the signal handlers in core.signals whenever the
+    token is deleted or the user is saved (e.g. is_active was flipped). The
+    handlers only reach the local cache of the process making the change,
+    so its entries expire after TOKEN_AUTH_CACHE['LOCAL_TIMEOUT'] (a few
+    seconds), which bounds how long other processes accept a revoked token.
+    Shared cache entries expire after TOKEN_AUTH_CACHE['TIMEOUT'].
+    '''
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Failed lookups raise AuthenticationFailed and are never cached.
+        user_token = super().authenticate_credentials(key)
+        token_cache.set(key, user_token)
+
+        return user_token
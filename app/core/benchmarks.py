@@ -0,0 +1,227 @@
+import gc
+import math
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from core.seeding import SEED_PASSWORD, seed_database
+
+
+def generate_dataset(users=10, tags=20, ingredients=50, recipes=200,
+                     tags_per_recipe=3, ingredients_per_recipe=5, seed=0):
+    # Insert users with their tags, ingredients and recipes (see
+    # core.seeding) and return the users. The same arguments always
+    # produce the same data.
+    user_ids = seed_database(
+        users=users,
+        tags=tags,
+        ingredients=ingredients,
+        recipes=recipes,
+        tags_per_recipe=tags_per_recipe,
+        ingredients_per_recipe=ingredients_per_recipe,
+        seed=seed
+    )
+    return list(get_user_model().objects.filter(
+        pk__in=user_ids
+    ).order_by('pk'))
+
+
+def api_endpoints(user):
+    # List the (name, method, url, payload(n)) of the endpoints in
+    # recipe/urls.py and user/urls.py to benchmark for the user. payload
+    # is given the number of the run, so creates don't collide.
+    '''
+    Note
+    upload-image is left out as it writes the uploaded files to the media
+    storage, and so are the deletes, which can only run once per object.
+    '''
+    recipe = Recipe.objects.filter(user=user).order_by('id').first()
+    tag_ids = list(Tag.objects.filter(user=user).order_by(
+        'id'
+    ).values_list('id', flat=True)[:2])
+    ingredient_ids = list(Ingredient.objects.filter(user=user).order_by(
+        'id'
+    ).values_list('id', flat=True)[:2])
+    tags_url = reverse('recipe:tag-list')
+    ingredients_url = reverse('recipe:ingredient-list')
+    recipes_url = reverse('recipe:recipe-list')
+    me_url = reverse('user:me')
+
+    def new_recipe(n):
+        return {
+            'title': f'Benchmark recipe {n}',
+            'time_minutes': 30,
+            'price': '12.50',
+            'tags': tag_ids,
+            'ingredients': ingredient_ids,
+        }
+
+    endpoints = [
+        ('tags-list', 'get', tags_url, None),
+        ('tags-list-assigned', 'get', tags_url + '?assigned_only=1', None),
+        ('tags-typeahead', 'get', tags_url + '?prefix=tag', None),
+        ('tags-create', 'post', tags_url,
+         lambda n: {'name': f'Benchmark tag {n}'}),
+        ('tags-bulk', 'post', reverse('recipe:tag-bulk'),
+         lambda n: [{'name': f'Benchmark tag {n}-{i}'} for i in range(10)]),
+        ('ingredients-list', 'get', ingredients_url, None),
+        ('ingredients-create', 'post', ingredients_url,
+         lambda n: {'name': f'Benchmark ingredient {n}'}),
+        ('recipes-list', 'get', recipes_url, None),
+        ('recipes-list-page', 'get', recipes_url + '?page_size=50', None),
+        ('recipes-list-filtered', 'get',
+         recipes_url + '?tags={}&max_time=60'.format(
+             ','.join(map(str, tag_ids))
+         ), None),
+        ('recipes-search', 'get', recipes_url + '?search=chicken', None),
+        ('recipes-create', 'post', recipes_url, new_recipe),
+        ('recipes-bulk', 'post', reverse('recipe:recipe-bulk'),
+         lambda n: [new_recipe(f'{n}-{i}') for i in range(10)]),
+        ('user-create', 'post', reverse('user:create'),
+         lambda n: {'email': f'benchmark-new{n}@example.com',
+                    'password': SEED_PASSWORD, 'name': 'New'}),
+        ('user-token', 'post', reverse('user:token'),
+         lambda n: {'email': user.email, 'password': SEED_PASSWORD}),
+        ('user-me', 'get', me_url, None),
+        ('user-me-update', 'patch', me_url,
+         lambda n: {'name': f'Bench {n}'}),
+    ]
+    if recipe is not None:
+        detail_url = reverse('recipe:recipe-detail', args=[recipe.id])
+        endpoints += [
+            ('recipes-detail', 'get', detail_url, None),
+            ('recipes-update', 'patch', detail_url,
+             lambda n: {'time_minutes': 10 + n % 50}),
+        ]
+
+    return endpoints
+
+
+def percentile(values, percent):
+    # Return the percentile of the values, interpolating between the two
+    # closest ones.
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * percent / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _clear_response_cache():
+    # The recipe responses are cached per user. Clearing them makes every
+    # run do the work of building the response, which is what we measure.
+    caches[settings.RECIPE_API_CACHE_ALIAS].clear()
+
+
+def benchmark_endpoint(requests, repeat=50, warmup=5):
+    # Time an endpoint in-process with the test client and return its
+    # latency percentiles (ms), query count and peak memory (KiB).
+    # requests holds a (client, method, url, payload) for each user and
+    # the runs cycle through them.
+    def call(n):
+        client, method, url, payload = requests[n % len(requests)]
+        if payload is None:
+            return getattr(client, method)(url)
+        return getattr(client, method)(url, payload(n), format='json')
+
+    for n in range(warmup):
+        _clear_response_cache()
+        call(n)
+
+    timings = []
+    for n in range(warmup, warmup + repeat):
+        _clear_response_cache()
+        start = time.perf_counter()
+        response = call(n)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Counting the queries and tracing the allocations slow the request
+    # down, so they each get a run of their own.
+    _clear_response_cache()
+    with CaptureQueriesContext(connection) as ctx:
+        call(warmup + repeat)
+    # captured_queries is read from the connection's query log, which the
+    # next request clears.
+    queries = len(ctx.captured_queries)
+    _clear_response_cache()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        call(warmup + repeat + 1)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries': queries,
+        'peak_memory_kib': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(users, repeat=50, warmup=5, only=None):
+    # Benchmark every endpoint (or the ones named in only) for the users
+    # and return the results by endpoint name.
+    endpoints = {}
+    for user in users:
+        client = APIClient()
+        client.force_authenticate(user)
+        for name, method, url, payload in api_endpoints(user):
+            endpoints.setdefault(name, []).append(
+                (client, method, url, payload)
+            )
+
+    results = {}
+    # The token endpoint is requested far faster than a login burst, which
+    # user.throttling would reject.
+    with override_settings(
+        LOGIN_THROTTLE=dict(settings.LOGIN_THROTTLE, ENABLED=False)
+    ):
+        for name, requests in endpoints.items():
+            if only and name not in only:
+                continue
+            results[name] = benchmark_endpoint(
+                requests, repeat=repeat, warmup=warmup
+            )
+
+    return results
+
+
+def compare_results(results, baseline, latency=0.2, queries=0, memory=0.5):
+    # Return a message for every endpoint that regressed from the baseline
+    # results. latency and memory are the allowed relative increase of the
+    # p95 latency and peak memory, queries the allowed extra queries.
+    regressions = []
+    for name, old in sorted(baseline.items()):
+        new = results.get(name)
+        if new is None:
+            continue
+        if new['queries'] > old['queries'] + queries:
+            regressions.append(
+                f'{name}: {new["queries"]} queries, was {old["queries"]}'
+            )
+        if new['p95_ms'] > old['p95_ms'] * (1 + latency):
+            regressions.append(
+                f'{name}: p95 {new["p95_ms"]:.2f} ms, '
+                f'was {old["p95_ms"]:.2f} ms'
+            )
+        if new['peak_memory_kib'] > old['peak_memory_kib'] * (1 + memory):
+            regressions.append(
+                f'{name}: peak memory {new["peak_memory_kib"]:.1f} KiB, '
+                f'was {old["peak_memory_kib"]:.1f} KiB'
+            )
+
+    return regressions
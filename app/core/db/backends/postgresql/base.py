@@ -0,0 +1,100 @@
+import functools
+
+from django.db.backends.postgresql import base, creation
+
+from core.db.pool import close_idle_connections, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Pooled connections would keep the test database from being dropped
+        close_idle_connections()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # PostgreSQL backend adding connection health checks and an optional
+    # in-process connection pool on top of Django's.
+    '''
+    Note
+    Settings read from the DATABASES entry, besides Django's own:
+    CONN_HEALTH_CHECKS - check a persistent connection still works before
+        the first query of each request, instead of failing that request.
+    POOL - {'SIZE': ..., 'TIMEOUT': ..., 'MAX_AGE': ...} to share a pool of
+        connections between the threads of a threaded server. Leave it out
+        (or set SIZE to 0) to use Django's per-thread connections.
+    '''
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+
+    def _get_pool(self, conn_params):
+        config = self.settings_dict.get('POOL') or {}
+        if not config.get('SIZE'):
+            return None
+        # The test runner also connects to the 'postgres' database, which
+        # needs a pool of its own.
+        key = f'{self.alias}/{conn_params.get("database")}'
+        return get_pool(
+            key,
+            config['SIZE'],
+            config.get('TIMEOUT', 30),
+            config.get('MAX_AGE')
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self._get_pool(conn_params)
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        connection = pool.checkout(
+            functools.partial(super().get_new_connection, conn_params)
+        )
+        # Reused connections skip the code setting this in Django.
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level',
+            connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        pool = None
+        if self.connection is not None:
+            pool = self._get_pool(self.get_connection_params())
+        if pool is None:
+            return super()._close()
+
+        # Don't hand a connection in the middle of a transaction or with
+        # unknown errors to the next thread.
+        usable = not self.errors_occurred
+        if usable and not self.connection.closed:
+            try:
+                self.connection.rollback()
+            except base.Database.Error:
+                usable = False
+        pool.checkin(self.connection, usable=usable)
+
+    def connect(self):
+        # A brand new connection doesn't need a health check. This has to be
+        # set first as connect() calls back into ensure_connection().
+        self.health_check_done = True
+        super().connect()
+
+    def close_if_unusable_or_obsolete(self):
+        # Django calls this at the start and end of every request.
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        # Check a connection kept from an earlier request once, right
+        # before it's first used in this one.
+        if (self.connection is not None and not self.health_check_done and
+                self.settings_dict.get('CONN_HEALTH_CHECKS') and
+                not self.in_atomic_block):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import deque
+
+from django.db.utils import OperationalError
+
+
+class ConnectionPool:
+    # Thread safe pool of open database connections for one database.
+    '''
+    Note
+    Django keeps one connection per thread. With a threaded server and
+    CONN_MAX_AGE every thread would hold its own connection open, with this
+    pool the threads share at most `size` connections and a thread only
+    holds one while it's serving a request.
+    '''
+
+    def __init__(self, size, timeout, max_age=None):
+        # timeout is how many seconds a checkout waits for a free connection
+        # and max_age how many seconds a connection is kept around before
+        # it's replaced.
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        # (connection, time it was opened) of the connections not in use.
+        self._idle = deque()
+        self._opened_at = {}
+        self.stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'opened': 0,
+            'recycled': 0,
+        }
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _discard(self, connection):
+        # Close a connection that won't be handed out again
+        self._opened_at.pop(id(connection), None)
+        self._count('recycled')
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def checkout(self, connect):
+        # Return an idle connection, or a new one from connect() if there is
+        # a free slot, waiting up to timeout seconds for one to be checked in.
+        if not self._slots.acquire(blocking=False):
+            self._count('waits')
+            if not self._slots.acquire(timeout=self.timeout):
+                self._count('timeouts')
+                raise OperationalError(
+                    f'No database connection available after waiting '
+                    f'{self.timeout} seconds (pool size {self.size}).'
+                )
+        self._count('checkouts')
+
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    connection, opened_at = self._idle.pop()
+                expired = (
+                    self.max_age is not None and
+                    time.monotonic() - opened_at >= self.max_age
+                )
+                if connection.closed or expired:
+                    self._discard(connection)
+                    continue
+                return connection
+
+            connection = connect()
+            self._opened_at[id(connection)] = time.monotonic()
+            self._count('opened')
+            return connection
+        except Exception:
+            self._slots.release()
+            raise
+
+    def close_idle(self):
+        # Close all of the connections that aren't checked out
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def checkin(self, connection, usable=True):
+        # Give a connection back to the pool, closing it if it's broken.
+        try:
+            if not usable or connection.closed:
+                self._discard(connection)
+                return
+            opened_at = self._opened_at.get(id(connection), time.monotonic())
+            with self._lock:
+                self._idle.append((connection, opened_at))
+        finally:
+            self._slots.release()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, size, timeout, max_age=None):
+    # Return the pool for key, creating it the first time it's used.
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(size, timeout, max_age)
+        return _pools[key]
+
+
+def pool_stats():
+    # Return {pool key: counters} for every pool in this process
+    with _pools_lock:
+        return {key: dict(pool.stats) for key, pool in _pools.items()}
+
+
+def close_idle_connections():
+    # Close the idle connections of every pool, e.g. before dropping a
+    # database they're connected to.
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_idle()
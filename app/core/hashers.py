@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    # Django's PBKDF2 hasher with its number of iterations taken from the
+    # PASSWORD_HASH_ITERATIONS setting.
+    '''
+    Note
+    After a successful login Django re-hashes the password when the stored
+    hash was made with another hasher than the first of PASSWORD_HASHERS,
+    or with another number of iterations (must_update()). Changing the
+    setting therefore upgrades the stored hashes as the users log in. This
+    replaces Django's own PBKDF2PasswordHasher in PASSWORD_HASHERS, since
+    they share the pbkdf2_sha256 algorithm name.
+    '''
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', None) or \
+            hashers.PBKDF2PasswordHasher.iterations
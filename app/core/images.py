@@ -0,0 +1,320 @@
+import os
+from datetime import timedelta
+
+# PIL is the Pillow library.
+from PIL import Image, features
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import ImageJob, Recipe, RecipeImageVariant, \
+                        recipe_image_file_path
+
+
+# EXIF tag holding the camera orientation, and the transpose operations that
+# turn an image with that orientation upright.
+EXIF_ORIENTATION = 274
+ORIENTATION_TRANSPOSE = {
+    2: (Image.FLIP_LEFT_RIGHT,),
+    3: (Image.ROTATE_180,),
+    4: (Image.FLIP_TOP_BOTTOM,),
+    5: (Image.FLIP_LEFT_RIGHT, Image.ROTATE_90),
+    6: (Image.ROTATE_270,),
+    7: (Image.FLIP_LEFT_RIGHT, Image.ROTATE_270),
+    8: (Image.ROTATE_90,),
+}
+
+
+def _apply_orientation(image):
+    # Rotate the image according to its EXIF orientation, since the EXIF
+    # data (and the orientation with it) is dropped when re-encoding.
+    get_exif = getattr(image, '_getexif', None)
+    exif = get_exif() if get_exif else None
+    if not exif:
+        return image
+    for method in ORIENTATION_TRANSPOSE.get(exif.get(EXIF_ORIENTATION), ()):
+        image = image.transpose(method)
+
+    return image
+
+
+def process_image(source_path, dest_path, max_size):
+    # Verify, strip EXIF, downscale and re-encode a raw upload as a JPEG.
+    # This only touches files, so it can run in a separate process.
+    '''
+    Note
+    verify() checks the file without decoding the pixels, but leaves the
+    image unusable, so the file is opened a second time to process it.
+    '''
+    with Image.open(source_path) as image:
+        image.verify()
+
+    with Image.open(source_path) as image:
+        image = _apply_orientation(image)
+        # thumbnail() only ever shrinks and keeps the aspect ratio.
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        # Saving without passing exif= drops all of the original metadata.
+        image.save(dest_path, format='JPEG', quality=85, optimize=True)
+
+
+# File extension and Pillow format name of each variant format.
+VARIANT_FORMATS = {
+    RecipeImageVariant.JPEG: ('jpg', 'JPEG'),
+    RecipeImageVariant.WEBP: ('webp', 'WEBP'),
+}
+
+
+def variant_formats():
+    # Variant formats supported by the installed Pillow. WebP needs Pillow
+    # to be built against libwebp.
+    formats = [RecipeImageVariant.JPEG]
+    if features.check('webp'):
+        formats.append(RecipeImageVariant.WEBP)
+
+    return formats
+
+
+def variant_targets(image_name):
+    # List (size, format, file name) of every variant of an image. The
+    # names only depend on the image's name, so rendering them again just
+    # finds the files already there.
+    base = os.path.splitext(image_name)[0]
+    return [
+        (size, fmt, f'{base}_{size}.{VARIANT_FORMATS[fmt][0]}')
+        for size in settings.RECIPE_IMAGE_VARIANT_SIZES
+        for fmt in variant_formats()
+    ]
+
+
+def render_variants(source_path, targets):
+    # Write each (dest_path, size, format) rendition of an image that
+    # doesn't exist yet and return the (width, height) of all of them.
+    # Like process_image this only touches files.
+    dimensions = []
+    with Image.open(source_path) as source:
+        source.load()
+        for dest_path, size, fmt in targets:
+            if os.path.exists(dest_path):
+                # Opening an image only reads its header, not the pixels.
+                with Image.open(dest_path) as existing:
+                    dimensions.append(existing.size)
+                continue
+            image = source.copy()
+            image.thumbnail((size, size), Image.LANCZOS)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            image.save(dest_path, format=VARIANT_FORMATS[fmt][1], quality=80)
+            dimensions.append(image.size)
+
+    return dimensions
+
+
+def process_upload(source_path, dest_path, max_size, targets):
+    # Process a raw upload and render its variants in one go
+    process_image(source_path, dest_path, max_size)
+    return render_variants(dest_path, targets)
+
+
+def save_variants(recipe, targets, dimensions):
+    # Store the rendered variants of the recipe's current image and
+    # remove the ones left over from a previous image.
+    names = []
+    for (size, fmt, name), (width, height) in zip(targets, dimensions):
+        RecipeImageVariant.objects.update_or_create(
+            recipe=recipe,
+            size=size,
+            format=fmt,
+            defaults={'image': name, 'width': width, 'height': height}
+        )
+        names.append(name)
+
+    stale = recipe.image_variants.exclude(image__in=names)
+    for variant in stale:
+        default_storage.delete(variant.image.name)
+    stale.delete()
+
+
+def claim_jobs(limit):
+    # Mark up to limit pending jobs as processing and return them.
+    # skip_locked lets several workers claim jobs at the same time without
+    # getting the same ones.
+    '''
+    Note
+    Jobs claimed longer than RECIPE_IMAGE_JOB_TIMEOUT seconds ago are
+    claimed again, since the worker which had them most likely died. The
+    claimed_at a worker got tells it whether a job is still its own when it
+    comes to finish it (see _lock_claimed).
+    '''
+    now = timezone.now()
+    expired = now - timedelta(seconds=settings.RECIPE_IMAGE_JOB_TIMEOUT)
+    with transaction.atomic():
+        jobs = list(
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=ImageJob.PENDING) |
+                Q(status=ImageJob.PROCESSING, claimed_at__lt=expired)
+            )
+            .order_by('created_at')[:limit]
+        )
+        ImageJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=ImageJob.PROCESSING,
+            claimed_at=now
+        )
+    for job in jobs:
+        job.status = ImageJob.PROCESSING
+        job.claimed_at = now
+
+    return jobs
+
+
+def _lock_claimed(job):
+    # Lock the job's recipe and check the job is still claimed by us.
+    # Returns the recipe, or None if it was deleted or the job was claimed
+    # again by another worker.
+    recipe = Recipe.objects.select_for_update().filter(
+        pk=job.recipe_id
+    ).first()
+    if recipe is None:
+        return None
+    claimed = ImageJob.objects.select_for_update().filter(
+        pk=job.pk,
+        status=ImageJob.PROCESSING,
+        claimed_at=job.claimed_at
+    ).exists()
+
+    return recipe if claimed else None
+
+
+def _drop_job(job, image_name, targets):
+    # Clean up after a job whose recipe was deleted while it was processed
+    # (the job row went with it), or which another worker took over.
+    # Every run writes its image and variants under new names, so ours are
+    # never used. The staged upload is only ours to delete with the recipe,
+    # the worker that took the job over still needs it.
+    for name in [image_name] + [name for _, _, name in targets]:
+        default_storage.delete(name)
+    if not Recipe.objects.filter(pk=job.recipe_id).exists():
+        job.staged_image.delete(save=False)
+
+
+def _finish_job(job, image_name, targets, dimensions):
+    # Attach the processed image to the recipe and drop the staged upload.
+    # Returns whether the job was finished.
+    with transaction.atomic():
+        recipe = _lock_claimed(job)
+        if recipe is not None:
+            old_name = recipe.image.name
+            recipe.image.name = image_name
+            recipe.image_status = Recipe.IMAGE_READY
+            recipe.save(
+                update_fields=['image', 'image_status', 'updated_at']
+            )
+            save_variants(recipe, targets, dimensions)
+            job.status = ImageJob.DONE
+            job.save(update_fields=['status'])
+
+    if recipe is None:
+        _drop_job(job, image_name, targets)
+        return False
+    job.staged_image.delete(save=False)
+    if old_name and old_name != image_name:
+        default_storage.delete(old_name)
+
+    return True
+
+
+def _fail_job(job, error, image_name, targets):
+    # Record why the upload couldn't be processed
+    with transaction.atomic():
+        recipe = _lock_claimed(job)
+        if recipe is not None:
+            recipe.image_status = Recipe.IMAGE_FAILED
+            # save() rather than update() so the post_save signal is sent.
+            recipe.save(update_fields=['image_status', 'updated_at'])
+            job.status = ImageJob.FAILED
+            job.error = str(error)
+            job.save(update_fields=['status', 'error'])
+
+    if recipe is None:
+        _drop_job(job, image_name, targets)
+    else:
+        job.staged_image.delete(save=False)
+
+
+def run_jobs(jobs, executor=None):
+    # Process claimed jobs, in the executor's processes if one is given.
+    # Returns the number of jobs that were processed successfully.
+    max_size = settings.RECIPE_IMAGE_MAX_SIZE
+    pending = []
+    for job in jobs:
+        image_name = recipe_image_file_path(job.recipe_id, 'image.jpg')
+        targets = variant_targets(image_name)
+        args = (
+            job.staged_image.path,
+            default_storage.path(image_name),
+            max_size,
+            [(default_storage.path(name), size, fmt)
+             for size, fmt, name in targets],
+        )
+        if executor is None:
+            pending.append((job, image_name, targets, None, args))
+        else:
+            future = executor.submit(process_upload, *args)
+            pending.append((job, image_name, targets, future, args))
+
+    processed = 0
+    for job, image_name, targets, future, args in pending:
+        try:
+            if future is None:
+                dimensions = process_upload(*args)
+            else:
+                dimensions = future.result()
+        except Exception as error:
+            _fail_job(job, error, image_name, targets)
+        else:
+            if _finish_job(job, image_name, targets, dimensions):
+                processed += 1
+
+    return processed
+
+
+def backfill_variants(recipes, executor=None):
+    # Render and store the variants of recipes that already have an image.
+    # Files that already exist are reused, so this can be run again safely.
+    # Returns the number of recipes that were backfilled.
+    pending = []
+    for recipe in recipes:
+        targets = variant_targets(recipe.image.name)
+        args = (
+            recipe.image.path,
+            [(default_storage.path(name), size, fmt)
+             for size, fmt, name in targets],
+        )
+        if executor is None:
+            pending.append((recipe, targets, None, args))
+        else:
+            future = executor.submit(render_variants, *args)
+            pending.append((recipe, targets, future, args))
+
+    processed = 0
+    for recipe, targets, future, args in pending:
+        try:
+            if future is None:
+                dimensions = render_variants(*args)
+            else:
+                dimensions = future.result()
+        except Exception:
+            # A broken image shouldn't stop the rest of the backfill.
+            continue
+        with transaction.atomic():
+            save_variants(recipe, targets, dimensions)
+        processed += 1
+
+    return processed
@@ -0,0 +1,50 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from core.images import backfill_variants
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    # Django command to render the responsive variants of existing images.
+    help = 'Render missing responsive variants of recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of processes used to render the variants.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of recipes rendered between database writes.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.filter(
+            image_status=Recipe.IMAGE_READY
+        ).exclude(image='').order_by('id')
+        batch_size = options['batch_size']
+
+        executor = None
+        if options['workers'] > 1:
+            executor = ProcessPoolExecutor(max_workers=options['workers'])
+
+        total = 0
+        last_id = 0
+        try:
+            while True:
+                # Walk the recipes by id so a batch never loads them all.
+                batch = list(recipes.filter(id__gt=last_id)[:batch_size])
+                if not batch:
+                    break
+                total += backfill_variants(batch, executor)
+                last_id = batch[-1].id
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered variants for {total} recipes.'
+        ))
@@ -0,0 +1,149 @@
+import json
+import platform
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from core.benchmarks import compare_results, generate_dataset, \
+                            run_benchmarks
+
+
+class Rollback(Exception):
+    # Raised to throw away the seeded data at the end of the benchmark.
+    pass
+
+
+class Command(BaseCommand):
+    # Django command timing every API endpoint in-process against a
+    # generated dataset, optionally checking the results for regressions
+    # against a stored baseline.
+    help = 'Benchmark the API endpoints on a generated dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--ingredients', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=200)
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            dest='endpoints',
+            help='Only benchmark this endpoint, can be given several times'
+        )
+        parser.add_argument('--output', help='Write the results to this file')
+        parser.add_argument(
+            '--baseline',
+            help='Results file to check the new results against'
+        )
+        parser.add_argument(
+            '--latency-threshold',
+            type=float,
+            default=0.2,
+            help='Allowed relative increase of the p95 latency'
+        )
+        parser.add_argument(
+            '--query-threshold',
+            type=int,
+            default=0,
+            help='Allowed number of extra queries'
+        )
+        parser.add_argument(
+            '--memory-threshold',
+            type=float,
+            default=0.5,
+            help='Allowed relative increase of the peak memory'
+        )
+
+    def _dataset(self, options):
+        return {
+            key: options[key] for key in (
+                'users', 'tags', 'ingredients', 'recipes', 'tags_per_recipe',
+                'ingredients_per_recipe', 'seed',
+            )
+        }
+
+    def _run(self, options):
+        # Generate the dataset and benchmark the endpoints on it, throwing
+        # away everything that was written once we're done.
+        if options['users'] < 1:
+            raise CommandError('At least one user is needed.')
+        # DEBUG keeps a log of every query, which would add to the timings.
+        with override_settings(
+            DEBUG=False,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ):
+            try:
+                with transaction.atomic():
+                    users = generate_dataset(**self._dataset(options))
+                    results = run_benchmarks(
+                        users,
+                        repeat=options['repeat'],
+                        warmup=options['warmup'],
+                        only=options['endpoints']
+                    )
+                    raise Rollback
+            except Rollback:
+                pass
+
+        return results
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat has to be at least 1.')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['results']
+
+        results = self._run(options)
+
+        self.stdout.write(
+            f'{"endpoint":<24}{"status":>7}{"p50":>10}{"p95":>10}'
+            f'{"p99":>10}{"queries":>9}{"memory":>12}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<24}{result["status"]:>7}'
+                f'{result["p50_ms"]:>8.2f}ms{result["p95_ms"]:>8.2f}ms'
+                f'{result["p99_ms"]:>8.2f}ms{result["queries"]:>9}'
+                f'{result["peak_memory_kib"]:>9.1f}KiB'
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'environment': {
+                        'database': connection.vendor,
+                        'python': platform.python_version(),
+                        'django': django.get_version(),
+                    },
+                    'dataset': self._dataset(options),
+                    'repeat': options['repeat'],
+                    'results': results,
+                }, f, indent=2, sort_keys=True)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if baseline is None:
+            return
+        regressions = compare_results(
+            results,
+            baseline,
+            latency=options['latency_threshold'],
+            queries=options['query_threshold'],
+            memory=options['memory_threshold']
+        )
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(
+                f'{len(regressions)} regressions against the baseline.'
+            )
+        self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,87 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Recipe, Tag
+from recipe.filters import filter_assigned
+
+
+class Rollback(Exception):
+    # Raised to throw away the seeded data at the end of the benchmark.
+    pass
+
+
+class Command(BaseCommand):
+    # Django command comparing the old JOIN + DISTINCT assigned_only filter
+    # with the EXISTS one on a seeded dataset with heavy tag reuse.
+    help = 'Benchmark the assigned_only filter of the tags endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--tags-per-recipe', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def _seed(self, options):
+        # Create one user whose few tags are each used by many recipes
+        user = get_user_model().objects.create(email='benchmark@test.com')
+        Tag.objects.bulk_create([
+            Tag(user=user, name=f'Tag {n}') for n in range(options['tags'])
+        ])
+        Recipe.objects.bulk_create([
+            Recipe(user=user, title=f'Recipe {n}', time_minutes=10, price=5)
+            for n in range(options['recipes'])
+        ], batch_size=1000)
+        # Not every database returns the ids from bulk_create.
+        tag_ids = list(Tag.objects.filter(user=user).values_list(
+            'id', flat=True
+        ))
+        recipe_ids = Recipe.objects.filter(user=user).values_list(
+            'id', flat=True
+        )
+        per_recipe = min(options['tags_per_recipe'], len(tag_ids))
+        through = Recipe.tags.through
+        random.seed(0)
+        through.objects.bulk_create([
+            through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in random.sample(tag_ids, per_recipe)
+        ], batch_size=1000)
+
+        return user
+
+    def _time(self, queryset, repeat):
+        # Return the median time in milliseconds to fetch the queryset
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = self._seed(options)
+                tags = Tag.objects.filter(user=user)
+                join = tags.filter(
+                    recipe__isnull=False
+                ).order_by('-name').distinct()
+                exists = filter_assigned(tags).order_by('-name', 'id')
+
+                join_ms = self._time(join, options['repeat'])
+                exists_ms = self._time(exists, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f'JOIN + DISTINCT: {join_ms:.2f} ms')
+        self.stdout.write(f'EXISTS:          {exists_ms:.2f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'Speedup: {join_ms / exists_ms:.1f}x'
+        ))
@@ -0,0 +1,109 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher, get_hashers, \
+                                       identify_hasher
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    # Django command timing each of the PASSWORD_HASHERS, which is what a
+    # login costs the server, and counting the stored hashes that will be
+    # upgraded to the preferred hasher as their users log in.
+    help = 'Benchmark the password hashers and report the stored hashes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Times to hash with each hasher'
+        )
+        parser.add_argument(
+            '--target-ms',
+            type=float,
+            default=0,
+            help='Suggest the PASSWORD_HASH_ITERATIONS taking this long'
+        )
+        parser.add_argument(
+            '--skip-users',
+            action='store_true',
+            help='Don\'t go through the stored password hashes'
+        )
+
+    def _time(self, hasher, repeat):
+        # Median seconds it takes the hasher to hash a password
+        timings = []
+        for _ in range(repeat):
+            salt = hasher.salt()
+            start = time.perf_counter()
+            hasher.encode('benchmark password', salt)
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
+
+    def _benchmark(self, repeat):
+        preferred = get_hasher()
+        self.stdout.write(f'{"hasher":<24}{"ms/hash":>10}{"hashes/s":>10}')
+        seconds = {}
+        for hasher in get_hashers():
+            name = hasher.algorithm + (' *' if hasher is preferred else '')
+            try:
+                seconds[hasher.algorithm] = self._time(hasher, repeat)
+            except ValueError:
+                # The hasher's library (e.g. argon2-cffi) isn't installed.
+                self.stdout.write(f'{name:<24}{"not installed":>20}')
+                continue
+            self.stdout.write(
+                f'{name:<24}{seconds[hasher.algorithm] * 1000:>10.1f}'
+                f'{1 / seconds[hasher.algorithm]:>10.1f}'
+            )
+
+        return preferred, seconds
+
+    def _suggest(self, preferred, seconds, target_ms):
+        # Scale the preferred hasher's iterations to the target time
+        if not hasattr(preferred, 'iterations') or \
+                preferred.algorithm not in seconds:
+            raise CommandError(
+                f'Can\'t suggest iterations for {preferred.algorithm}.'
+            )
+        per_iteration = seconds[preferred.algorithm] / preferred.iterations
+        self.stdout.write(
+            f'PASSWORD_HASH_ITERATIONS='
+            f'{round(target_ms / 1000 / per_iteration)} takes about '
+            f'{target_ms:.0f}ms a hash (now {preferred.iterations})'
+        )
+
+    def _stored(self, preferred):
+        # Count the stored hashes by algorithm and the ones to upgrade
+        counts = {}
+        outdated = 0
+        passwords = get_user_model().objects.values_list('password', flat=True)
+        for encoded in passwords.iterator():
+            try:
+                hasher = identify_hasher(encoded)
+            except ValueError:
+                # Unusable or unknown password, nothing to upgrade.
+                continue
+            counts[hasher.algorithm] = counts.get(hasher.algorithm, 0) + 1
+            if hasher.algorithm != preferred.algorithm or \
+                    hasher.must_update(encoded):
+                outdated += 1
+
+        for algorithm, count in sorted(counts.items()):
+            self.stdout.write(f'{algorithm:<24}{count:>10} stored hashes')
+        self.stdout.write(
+            f'{outdated} of {sum(counts.values())} stored hashes will be '
+            f'upgraded on login'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+
+        preferred, seconds = self._benchmark(options['repeat'])
+        if options['target_ms']:
+            self._suggest(preferred, seconds, options['target_ms'])
+        if not options['skip_users']:
+            self._stored(preferred)
@@ -0,0 +1,117 @@
+import io
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.models import Ingredient, Recipe, Tag
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+from recipe.serializers import RecipeDetailSerializer
+
+
+class Rollback(Exception):
+    # Raised to throw away the seeded data at the end of the benchmark.
+    pass
+
+
+class Command(BaseCommand):
+    # Django command comparing the stdlib and orjson renderer/parser on a
+    # list of serialized recipes with their tags and ingredients.
+    help = 'Benchmark the fast JSON renderer and parser'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def _seed(self, options):
+        # Create and serialize recipes with a few tags and ingredients each
+        user = get_user_model().objects.create(email='benchmark@test.com')
+        tags = [
+            Tag.objects.create(user=user, name=f'Tag {n}') for n in range(5)
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=user, name=f'Ingredient {n}')
+            for n in range(5)
+        ]
+        Recipe.objects.bulk_create([
+            Recipe(
+                user=user,
+                title=f'Recipe {n}',
+                time_minutes=n % 120,
+                price=f'{n % 100}.99',
+                link=f'https://example.com/recipes/{n}'
+            )
+            for n in range(options['recipes'])
+        ], batch_size=1000)
+        recipes = Recipe.objects.filter(user=user)
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in tags
+        ], batch_size=1000)
+        Recipe.ingredients.through.objects.bulk_create([
+            Recipe.ingredients.through(recipe=recipe, ingredient=ingredient)
+            for recipe in recipes for ingredient in ingredients
+        ], batch_size=1000)
+
+        return RecipeDetailSerializer(
+            recipes.with_related_names().order_by('-id'),
+            many=True
+        ).data
+
+    def _time(self, func, repeat):
+        # Return the median time in milliseconds to call func
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return statistics.median(timings)
+
+    def _compare(self, name, slow, fast, repeat):
+        slow_ms = self._time(slow, repeat)
+        fast_ms = self._time(fast, repeat)
+        self.stdout.write(f'{name} json:   {slow_ms:.2f} ms')
+        self.stdout.write(f'{name} orjson: {fast_ms:.2f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'{name} speedup: {slow_ms / fast_ms:.1f}x'
+        ))
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson is not installed, both paths use the stdlib'
+            ))
+
+        try:
+            with transaction.atomic():
+                data = self._seed(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+        body = JSONRenderer().render(data)
+        if FastJSONRenderer().render(data) != body:
+            self.stdout.write(self.style.ERROR('The rendered output differs'))
+        self.stdout.write(f'{len(data)} recipes, {len(body)} bytes')
+
+        repeat = options['repeat']
+        self._compare(
+            'Render',
+            lambda: JSONRenderer().render(data),
+            lambda: FastJSONRenderer().render(data),
+            repeat
+        )
+        self._compare(
+            'Parse',
+            lambda: JSONParser().parse(io.BytesIO(body)),
+            lambda: FastJSONParser().parse(io.BytesIO(body)),
+            repeat
+        )
@@ -0,0 +1,54 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from core.images import claim_jobs, run_jobs
+
+
+class Command(BaseCommand):
+    # Django command to process uploaded recipe images in the background.
+    help = 'Process recipe images waiting in the staging area'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of processes used to decode and re-encode images.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=20,
+            help='Number of jobs claimed from the database at once.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Seconds to wait before checking again for new jobs.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once there are no pending jobs left.'
+        )
+
+    def handle(self, *args, **options):
+        executor = None
+        if options['workers'] > 1:
+            # The worker processes only ever work on files, all of the
+            # database access stays in this process.
+            executor = ProcessPoolExecutor(max_workers=options['workers'])
+
+        try:
+            while True:
+                jobs = claim_jobs(options['batch_size'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                processed = run_jobs(jobs, executor)
+                self.stdout.write(
+                    f'Processed {processed} of {len(jobs)} images.'
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown()
@@ -0,0 +1,109 @@
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import list_profiles, read_stacks
+
+
+class Command(BaseCommand):
+    # Django command listing the request profiles written by
+    # core.middleware.ProfilingMiddleware, or merging their stacks into one
+    # collapsed stack file (e.g. to open in speedscope).
+    help = 'List or aggregate the captured request profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory',
+            default=settings.PROFILING['DIRECTORY'],
+            help='Directory the profiles were written to'
+        )
+        parser.add_argument('--view', help='Only the profiles of this view')
+        parser.add_argument(
+            '--min-duration',
+            type=float,
+            default=0,
+            help='Only the profiles of requests that took this many ms'
+        )
+        parser.add_argument(
+            '--aggregate',
+            action='store_true',
+            help='Merge the stacks of the profiles instead of listing them'
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write the aggregated stacks to instead of stdout'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=0,
+            help='Also show the functions most often on top of the stacks'
+        )
+
+    def _profiles(self, options):
+        return [
+            profile for profile in list_profiles(options['directory'])
+            if (not options['view'] or profile['view'] == options['view'])
+            and profile['duration_ms'] >= options['min_duration']
+        ]
+
+    def _list(self, profiles):
+        self.stdout.write(
+            f'{"id":<26}{"time":<21}{"method":<8}{"status":>6}'
+            f'{"ms":>10}{"samples":>9}  view'
+        )
+        for profile in profiles:
+            when = datetime.fromtimestamp(profile['time'])
+            self.stdout.write(
+                f'{profile["id"]:<26}{when:%Y-%m-%d %H:%M:%S}  '
+                f'{profile["method"]:<8}{profile["status"]:>6}'
+                f'{profile["duration_ms"]:>10.1f}{profile["samples"]:>9}  '
+                f'{profile["view"]}'
+            )
+
+    def _stacks(self, profiles, options):
+        # The stack counts of all of the profiles added up
+        stacks = Counter()
+        for profile in profiles:
+            stacks.update(read_stacks(options['directory'], profile['id']))
+        return stacks
+
+    def _aggregate(self, profiles, stacks, options):
+        lines = [f'{stack} {count}\n' for stack, count in stacks.most_common()]
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.writelines(lines)
+            self.stdout.write(
+                f'{len(profiles)} profiles, {sum(stacks.values())} samples '
+                f'written to {options["output"]}'
+            )
+        else:
+            self.stdout.write(''.join(lines), ending='')
+
+    def _top(self, stacks, count):
+        # The functions on top of the most samples (their self time)
+        leaves = Counter()
+        for stack, samples in stacks.items():
+            leaves[stack.rpartition(';')[2]] += samples
+        total = sum(leaves.values()) or 1
+        self.stdout.write(f'{"samples":>9}{"%":>7}  function')
+        for leaf, samples in leaves.most_common(count):
+            self.stdout.write(
+                f'{samples:>9}{samples * 100 / total:>6.1f}%  {leaf}'
+            )
+
+    def handle(self, *args, **options):
+        profiles = self._profiles(options)
+        if not profiles:
+            raise CommandError('No profiles found.')
+
+        if options['aggregate'] or options['top']:
+            stacks = self._stacks(profiles, options)
+        if options['aggregate']:
+            self._aggregate(profiles, stacks, options)
+        else:
+            self._list(profiles)
+        if options['top']:
+            self._top(stacks, options['top'])
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.seeding import SEED_PASSWORD, seed_database
+
+
+class Command(BaseCommand):
+    # Django command filling the database with generated users, tags,
+    # ingredients and recipes, e.g. to reproduce issues at production scale.
+    help = 'Insert generated users with their tags, ingredients and recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--ingredients', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=1000,
+                            help='Recipes per user')
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--password',
+            default=SEED_PASSWORD,
+            help='Password of all of the seeded users'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def _report(self, table, rows, seconds):
+        rate = rows / seconds if seconds else 0
+        self.stdout.write(
+            f'{table:<28}{rows:>12} rows{seconds:>9.2f}s'
+            f'{rate:>12.0f} rows/s'
+        )
+
+    def handle(self, *args, **options):
+        counts = ('users', 'tags', 'ingredients', 'recipes',
+                  'tags_per_recipe', 'ingredients_per_recipe')
+        if any(options[key] < 0 for key in counts):
+            raise CommandError('The counts can\'t be negative.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size has to be at least 1.')
+
+        start = time.perf_counter()
+        rows = 0
+
+        def report(table, count, seconds):
+            nonlocal rows
+            self._report(table, count, seconds)
+            if table != 'search vectors':
+                rows += count
+
+        user_ids = seed_database(
+            **{key: options[key] for key in counts},
+            seed=options['seed'],
+            password=options['password'],
+            batch_size=options['batch_size'],
+            report=report
+        )
+
+        seconds = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(user_ids)} users, {rows} rows in {seconds:.2f}s '
+            f'({rows / seconds:.0f} rows/s)'
+        ))
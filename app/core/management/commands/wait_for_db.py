@@ -1,29 +1,81 @@
 # time is default python module to make our DB sleep.
+import random
 import time
 
 # connections module to test if DB connection is available.
 from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
 from django.db.utils import OperationalError
 # BaseCommand class is what we need to build on to create our custom command.
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     # Django command to pause execution until Database is available.
+    help = 'Wait until the database accepts queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait in total before giving up.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0.1,
+            help='Seconds to wait after the first failed attempt, doubled '
+                 'after every further failed attempt.'
+        )
+        parser.add_argument(
+            '--max-interval', type=float, default=5,
+            help='Longest wait between two attempts.'
+        )
+        parser.add_argument(
+            '--migrations', action='store_true',
+            help='Also wait until all migrations have been applied.'
+        )
+
+    def _pending_migrations(self, connection):
+        # Return how many migrations still have to be applied
+        executor = MigrationExecutor(connection)
+        targets = executor.loader.graph.leaf_nodes()
+        return len(executor.migration_plan(targets))
 
     # Handle function that is run whenever we run this management command.
     # *args and **options allow us to pass custom options (like waittimes)
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        # while db is none, try and set connection. If unavailable
-        # throw OperationalError, catch, write, then sleep.
-        while not db_conn:
+        deadline = time.monotonic() + options['timeout']
+        interval = options['interval']
+        db_conn = connections['default']
+
+        while True:
             try:
-                db_conn = connections['default']
+                # Fetching connections['default'] doesn't open a socket,
+                # this actually connects and runs a query.
+                db_conn.ensure_connection()
+                with db_conn.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                pending = 0
+                if options['migrations']:
+                    pending = self._pending_migrations(db_conn)
+                if not pending:
+                    break
+                reason = f'{pending} migrations not applied yet'
             except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                reason = 'Database unavailable'
+                # Don't reuse a half opened connection on the next attempt.
+                db_conn.close()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise CommandError(
+                    f'{reason} after {options["timeout"]} seconds.'
+                )
+            # Exponential backoff with jitter, so that many containers
+            # starting at once don't retry in lockstep.
+            delay = min(interval * random.uniform(0.5, 1), remaining)
+            self.stdout.write(f'{reason}, waiting {delay:.2f} seconds...')
+            time.sleep(delay)
+            interval = min(interval * 2, options['max_interval'])
 
         # database is finally available. The success function outputs in green.
         self.stdout.write(self.style.SUCCESS('Database available!'))
@@ -0,0 +1,139 @@
+import threading
+from bisect import bisect_left
+
+
+# Upper bounds of the histogram buckets of durations in seconds and of
+# query counts.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _format_labels(labels):
+    # Render (name, value) pairs as Prometheus labels
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+         .replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) \
+        + '}'
+
+
+def _format_number(value):
+    # Render a sample value or bucket bound
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    # Monotonic count per set of label values.
+    kind = 'counter'
+
+    def __init__(self, name, help_text, label_names=(), lock=None):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        # Metrics of a registry share its lock, so rendering them doesn't
+        # catch one half way through an update.
+        self._lock = lock or threading.Lock()
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = \
+                self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in sorted(self._values.items()):
+            yield '', tuple(zip(self.label_names, label_values)), value
+
+
+class Histogram(Counter):
+    # Observations counted in cumulative buckets per set of label values,
+    # along with their count and sum.
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=(),
+                 lock=None):
+        super().__init__(name, help_text, label_names, lock)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                # The count of each bucket (not cumulative) and of the
+                # values above the last one, then the sum.
+                entry = [0] * (len(self.buckets) + 2)
+                self._values[label_values] = entry
+            entry[bisect_left(self.buckets, value)] += 1
+            entry[-1] += value
+
+    def samples(self):
+        for label_values, entry in sorted(self._values.items()):
+            labels = tuple(zip(self.label_names, label_values))
+            total = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry):
+                total += count
+                yield '_bucket', labels + (('le', _format_number(bound)),), \
+                    total
+            yield '_count', labels, total
+            yield '_sum', labels, entry[-1]
+
+
+class MetricsRegistry:
+    # The metrics of this process, rendered in the Prometheus text format.
+    '''
+    Note
+    Every process has its own registry. With several worker processes
+    behind one port, a scrape only sees the requests served by the worker
+    that answered it.
+    '''
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, *args, **kwargs):
+        # Return the metric called name, creating it the first time
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(
+                    name, *args, lock=self._lock, **kwargs
+                )
+            return self._metrics[name]
+
+    def counter(self, name, help_text, label_names=()):
+        return self._get(Counter, name, help_text, label_names)
+
+    def histogram(self, name, help_text, label_names=(), buckets=()):
+        return self._get(Histogram, name, help_text, label_names,
+                         buckets=buckets)
+
+    def reset(self):
+        # Forget every value recorded so far
+        with self._lock:
+            for metric in self._metrics.values():
+                metric._values.clear()
+
+    def render(self, extra=()):
+        # Return the metrics, followed by the extra ones (metrics outside of
+        # the registry), in the text format.
+        lines = []
+        with self._lock:
+            for metric in list(self._metrics.values()) + list(extra):
+                lines.append(f'# HELP {metric.name} {metric.help_text}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+                for suffix, labels, value in metric.samples():
+                    lines.append(
+                        f'{metric.name}{suffix}{_format_labels(labels)} '
+                        f'{_format_number(value)}'
+                    )
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
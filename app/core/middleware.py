@@ -0,0 +1,218 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from core.authentication import CachedTokenAuthentication
+from core.metrics import DURATION_BUCKETS, QUERY_BUCKETS, registry
+from core.profiling import Sampler, write_profile
+
+
+logger = logging.getLogger('api.requests')
+
+LABELS = ('view', 'method')
+
+request_duration = registry.histogram(
+    'api_request_duration_seconds',
+    'Wall time of the sampled requests.',
+    LABELS,
+    buckets=DURATION_BUCKETS
+)
+request_db_duration = registry.histogram(
+    'api_request_db_duration_seconds',
+    'Time the sampled requests spent running SQL queries.',
+    LABELS,
+    buckets=DURATION_BUCKETS
+)
+request_queries = registry.histogram(
+    'api_request_queries',
+    'Number of SQL queries run by the sampled requests.',
+    LABELS,
+    buckets=QUERY_BUCKETS
+)
+duplicate_queries = registry.counter(
+    'api_request_duplicate_queries_total',
+    'SQL queries the sampled requests ran more than once with the same '
+    'parameters.',
+    LABELS
+)
+responses = registry.counter(
+    'api_responses_total',
+    'Responses to the sampled requests by status code.',
+    LABELS + ('status',)
+)
+
+
+class QueryRecorder:
+    # Database execute wrapper counting and timing the queries it sees.
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self._seen = set()
+
+    @property
+    def duplicates(self):
+        # Queries that were already run with the same parameters
+        return self.count - len(self._seen)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            # The parameters of executemany() can be huge and aren't
+            # repeated in practice.
+            self._seen.add((sql, None if many else repr(params)))
+
+
+def _view_name(request):
+    # The URL name of the request's view, which keeps the number of label
+    # values bounded (unlike the path).
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+class InstrumentationMiddleware:
+    # Records the wall time, database time, query count and duplicate
+    # query count of a sample of the requests. They're reported in a
+    # Server-Timing header, a JSON log line on the api.requests logger and
+    # the per view histograms served by core.views.metrics.
+    '''
+    Note
+    Queries are timed with the connections' execute wrappers, so this
+    works with DEBUG off. INSTRUMENTATION['SAMPLE_RATE'] is the fraction
+    of the requests that are recorded; the others only cost a call to
+    random(). It should be the first of the MIDDLEWARE so it times all
+    of the others.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = getattr(settings, 'INSTRUMENTATION', {})
+        self.sample_rate = config.get('SAMPLE_RATE', 1.0)
+        self.server_timing = config.get('SERVER_TIMING', True)
+        self.log = config.get('LOG', True)
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = _view_name(request)
+        request_duration.observe(duration, view, request.method)
+        request_db_duration.observe(recorder.duration, view, request.method)
+        request_queries.observe(recorder.count, view, request.method)
+        if recorder.duplicates:
+            duplicate_queries.inc(
+                view, request.method, amount=recorder.duplicates
+            )
+        responses.inc(view, request.method, str(response.status_code))
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;dur={recorder.duration * 1000:.2f};'
+                f'desc="{recorder.count} queries, '
+                f'{recorder.duplicates} duplicates", '
+                f'total;dur={duration * 1000:.2f}'
+            )
+        if self.log and logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 2),
+                'db_ms': round(recorder.duration * 1000, 2),
+                'queries': recorder.count,
+                'duplicate_queries': recorder.duplicates,
+            }))
+
+        return response
+
+
+def _is_staff(request):
+    # Whether the request comes from a staff user, logged in to the admin
+    # or sending a token. This runs before the view authenticates the
+    # request, so the token is looked up here (usually in the token cache).
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    try:
+        result = CachedTokenAuthentication().authenticate(Request(request))
+    except AuthenticationFailed:
+        return False
+
+    return result is not None and result[0].is_staff
+
+
+class ProfilingMiddleware:
+    # Records a sampling profile of the requests asking for one with the
+    # X-Profile header or profile query param (only honoured for staff
+    # users), and of PROFILING['SAMPLE_RATE'] of all requests. The stacks
+    # are written to PROFILING['DIRECTORY'] in the collapsed format, see
+    # core.profiling and the profiles management command.
+    '''
+    Note
+    Profiling is opt-in: unless PROFILING['ENABLED'] is set this
+    middleware removes itself when it's loaded. It comes after
+    AuthenticationMiddleware, so admin sessions are recognised as staff.
+    '''
+
+    def __init__(self, get_response):
+        config = getattr(settings, 'PROFILING', {})
+        if not config.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = config.get('SAMPLE_RATE', 0)
+        self.interval = config.get('INTERVAL', 0.005)
+        self.directory = config['DIRECTORY']
+
+    def _requested(self, request):
+        return request.META.get('HTTP_X_PROFILE') == '1' or \
+            request.GET.get('profile') == '1'
+
+    def __call__(self, request):
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled and not (self._requested(request) and
+                                _is_staff(request)):
+            return self.get_response(request)
+
+        sampler = Sampler(self.interval).start()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = sampler.stop()
+        duration = time.perf_counter() - start
+
+        response['X-Profile-Id'] = write_profile(self.directory, stacks, {
+            'time': time.time(),
+            'method': request.method,
+            'path': request.path,
+            'view': _view_name(request),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'interval': self.interval,
+        })
+
+        return response
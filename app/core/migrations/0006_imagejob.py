@@ -0,0 +1,47 @@
+# Generated by Django 2.1.15 on 2026-10-17 01:08
+
+import core.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def mark_existing_images_ready(apps, schema_editor):
+    # Images uploaded before background processing are already final.
+    Recipe = apps.get_model('core', 'Recipe')
+    Recipe.objects.exclude(image='').exclude(image__isnull=True).update(
+        image_status='ready'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('staged_image', models.FileField(upload_to=core.models.recipe_image_staging_path)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(choices=[('none', 'No image'), ('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='imagejob',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_jobs', to='core.Recipe'),
+        ),
+        migrations.RunPython(
+            mark_existing_images_ready,
+            migrations.RunPython.noop
+        ),
+    ]
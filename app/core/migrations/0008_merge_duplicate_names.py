@@ -0,0 +1,47 @@
+# Generated by Django 2.1.15 on 2026-10-17 01:11
+
+from django.db import migrations, models
+
+
+def merge_duplicate_names(apps, schema_editor):
+    # Merge tags/ingredients with the same name for the same user into the
+    # oldest one, so the unique constraint can be added.
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field_name).through
+        target = f'{model_name.lower()}_id'
+        duplicates = model.objects.values('user_id', 'name').annotate(
+            count=models.Count('id'),
+            keep=models.Min('id')
+        ).filter(count__gt=1)
+        for duplicate in duplicates:
+            others = list(model.objects.filter(
+                user_id=duplicate['user_id'],
+                name=duplicate['name']
+            ).exclude(id=duplicate['keep']).values_list('id', flat=True))
+            linked = set(through.objects.filter(**{
+                f'{target}__in': others + [duplicate['keep']]
+            }).values_list('recipe_id', flat=True))
+            kept = set(through.objects.filter(**{
+                target: duplicate['keep']
+            }).values_list('recipe_id', flat=True))
+            through.objects.bulk_create([
+                through(**{'recipe_id': recipe_id, target: duplicate['keep']})
+                for recipe_id in linked - kept
+            ])
+            model.objects.filter(id__in=others).delete()
+
+
+class Migration(migrations.Migration):
+    # Kept apart from the constraints added in 0008_per_user_indexes, since
+    # PostgreSQL can't alter the tables in the transaction that deleted
+    # rows from them (the deletes leave pending foreign key trigger events).
+
+    dependencies = [
+        ('core', '0007_recipeimagevariant'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Same document as recipe.search.search_vector(), which keeps it up to date
+# from here on.
+BACKFILL_SQL = '''
+UPDATE core_recipe SET search_vector =
+    setweight(to_tsvector('simple', title), 'A') ||
+    setweight(to_tsvector('simple', coalesce((
+        SELECT string_agg(t.name, ' ')
+        FROM core_tag t
+        JOIN core_recipe_tags rt ON rt.tag_id = t.id
+        WHERE rt.recipe_id = core_recipe.id
+    ), '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce((
+        SELECT string_agg(i.name, ' ')
+        FROM core_ingredient i
+        JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id
+        WHERE ri.recipe_id = core_recipe.id
+    ), '')), 'B')
+'''
+
+
+def create_search_index(apps, schema_editor):
+    # Only PostgreSQL has GIN indexes and full-text search.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX recipe_search_vector_idx '
+        'ON core_recipe USING gin (search_vector)'
+    )
+    schema_editor.execute(BACKFILL_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX recipe_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
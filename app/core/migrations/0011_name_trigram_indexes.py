@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # pg_trgm ships with PostgreSQL's contrib modules, which not every
+    # server has. recipe.filters.filter_typeahead() works without it.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Django's icontains/istartswith compare UPPER(name), so that's what is
+    # indexed.
+    schema_editor.execute(
+        'CREATE INDEX tag_name_trgm_idx '
+        'ON core_tag USING gin (UPPER(name) gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX ingredient_name_trgm_idx '
+        'ON core_ingredient USING gin (UPPER(name) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS tag_name_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS ingredient_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.15 on 2026-10-17 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_throttlebucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagejob',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.1.15 on 2026-10-17 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_imagejob_claimed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='throttlebucket',
+            name='full_at',
+            field=models.FloatField(db_index=True, default=0),
+            preserve_default=False,
+        ),
+    ]
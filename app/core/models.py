@@ -5,6 +5,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                         PermissionsMixin
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
 # these are all things needed to extend Django user model.
 
 
@@ -16,6 +18,20 @@ def recipe_image_file_path(instance, filename):
     return os.path.join('uploads/recipe/', filename)
 
 
+def recipe_image_staging_path(instance, filename):
+    # Generate file path for a raw upload waiting to be processed.
+    ext = filename.split('.')[-1]
+    filename = f'{uuid.uuid4()}.{ext}'
+
+    return os.path.join('uploads/staging/', filename)
+
+
+def touch_updated_at(model, pks):
+    # Set updated_at of the given objects to now, without sending any
+    # signals or loading them.
+    model.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+
+
 class UserManager(BaseUserManager):
 
     # what **extra_fields does is, takes all the extra functions passed in and
@@ -65,6 +81,12 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # A user can't have the same name twice. The unique index on
+        # (user_id, name) also serves the per-user lists ordered by name.
+        unique_together = ('user', 'name')
 
     def __str__(self):
         return self.name
@@ -77,11 +99,63 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # A user can't have the same name twice. The unique index on
+        # (user_id, name) also serves the per-user lists ordered by name.
+        unique_together = ('user', 'name')
 
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    # Queryset helpers that load a recipe's related tags and ingredients
+    # up front, so serializing N recipes doesn't cost 2N extra queries.
+    # Only the columns that the recipe serializers actually render.
+    LIST_FIELDS = ('id', 'user_id', 'title', 'time_minutes', 'price', 'link',
+                   'image_status')
+
+    def with_related_ids(self):
+        # Prefetch only the primary keys of the tags and ingredients. This is
+        # all RecipeSerializer's PrimaryKeyRelatedFields need. The image
+        # variants are needed for the srcset of every recipe.
+        # Everything is ordered by id, like in RecipeValuesSerializer.
+        return self.only(*self.LIST_FIELDS).prefetch_related(
+            models.Prefetch(
+                'tags',
+                queryset=Tag.objects.only('id').order_by('id')
+            ),
+            models.Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.only('id').order_by('id')
+            ),
+            models.Prefetch(
+                'image_variants',
+                queryset=RecipeImageVariant.objects.order_by('id')
+            ),
+        )
+
+    def with_related_names(self):
+        # Prefetch the id and name of the tags and ingredients, which is
+        # what the nested serializers in RecipeDetailSerializer render.
+        return self.only(*self.LIST_FIELDS).prefetch_related(
+            models.Prefetch(
+                'tags',
+                queryset=Tag.objects.only('id', 'name').order_by('id')
+            ),
+            models.Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.only('id', 'name').order_by('id')
+            ),
+            models.Prefetch(
+                'image_variants',
+                queryset=RecipeImageVariant.objects.order_by('id')
+            ),
+        )
+
+
 class Recipe(models.Model):
     # Recipe object
     user = models.ForeignKey(
@@ -97,6 +171,122 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # Uploaded images are processed in the background, see ImageJob.
+    IMAGE_NONE = 'none'
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_NONE, 'No image'),
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+    image_status = models.CharField(
+        max_length=10,
+        choices=IMAGE_STATUS_CHOICES,
+        default=IMAGE_NONE
+    )
+    # Also touched when the recipe's tags or ingredients change, see
+    # recipe.signals.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Full-text search document of the title and the tag and ingredient
+    # names, kept up to date by recipe.signals (see recipe.search).
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Every recipe query is for a single user's recipes by id.
+            models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+            # The range filters and orderings of the recipes endpoint.
+            models.Index(
+                fields=['user', 'time_minutes'],
+                name='recipe_user_time_idx'
+            ),
+            models.Index(
+                fields=['user', 'price'],
+                name='recipe_user_price_idx'
+            ),
+        ]
+        # search_vector has a GIN index on PostgreSQL, created by migration
+        # 0010_recipe_search_vector.
 
     def __str__(self):
         return self.title
+
+
+class ImageJob(models.Model):
+    # A recipe image upload waiting in the staging area to be processed
+    # by the process_recipe_images worker.
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (PROCESSING, 'Processing'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+    recipe = models.ForeignKey(
+        'Recipe',
+        on_delete=models.CASCADE,
+        related_name='image_jobs'
+    )
+    staged_image = models.FileField(upload_to=recipe_image_staging_path)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING
+    )
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When a worker last claimed the job, see core.images.claim_jobs.
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.recipe} ({self.status})'
+
+
+class RecipeImageVariant(models.Model):
+    # A resized rendition of a recipe image, used for responsive images.
+    JPEG = 'jpeg'
+    WEBP = 'webp'
+    FORMAT_CHOICES = (
+        (JPEG, 'JPEG'),
+        (WEBP, 'WebP'),
+    )
+    recipe = models.ForeignKey(
+        'Recipe',
+        on_delete=models.CASCADE,
+        related_name='image_variants'
+    )
+    # size is the bounding box the image was fit in, width and height are
+    # the real dimensions of the rendition.
+    size = models.PositiveIntegerField()
+    format = models.CharField(max_length=4, choices=FORMAT_CHOICES)
+    image = models.FileField()
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('recipe', 'size', 'format')
+
+    def __str__(self):
+        return f'{self.recipe} {self.size}px {self.format}'
+
+
+class ThrottleBucket(models.Model):
+    # Token bucket of user.throttling.DatabaseBucketStore, shared by every
+    # process. A bucket that filled up again is the same as no bucket.
+    key = models.CharField(max_length=255, unique=True)
+    tokens = models.FloatField()
+    # Unix time the tokens were last counted at.
+    updated_at = models.FloatField()
+    # Unix time the bucket is full again, after which it can be deleted.
+    full_at = models.FloatField(db_index=True)
+
+    def __str__(self):
+        return f'{self.key} ({self.tokens:.1f})'
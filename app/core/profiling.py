@@ -0,0 +1,118 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+
+# Source file paths already shortened by _short_path().
+_short_paths = {}
+
+
+def _short_path(filename):
+    # Path of a source file relative to the sys.path entry it's under, so
+    # stacks read e.g. recipe/views.py instead of the full path.
+    short = _short_paths.get(filename)
+    if short is None:
+        short = filename
+        for base in sorted(filter(None, sys.path), key=len, reverse=True):
+            if filename.startswith(base.rstrip(os.sep) + os.sep):
+                short = filename[len(base.rstrip(os.sep)) + 1:]
+                break
+        _short_paths[filename] = short
+    return short
+
+
+def _frame_label(code):
+    # Name of a stack frame in the collapsed format, which can't contain
+    # the ';' separating the frames.
+    label = f'{code.co_name} ({_short_path(code.co_filename)}:' \
+            f'{code.co_firstlineno})'
+    return label.replace(';', ':')
+
+
+class Sampler:
+    # Samples the stack of one thread from a background thread every
+    # interval seconds, counting how often each stack was seen.
+    '''
+    Note
+    A sample is only taken when the sampling thread gets the GIL, so the
+    real interval can be a bit longer than the requested one. The sampled
+    thread isn't slowed down beyond sharing the GIL.
+    '''
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        if stack:
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+def write_profile(directory, stacks, info):
+    # Write the stacks in the collapsed format (which speedscope and
+    # flamegraph.pl read) with the info about the request next to them,
+    # and return the id of the profile.
+    os.makedirs(directory, exist_ok=True)
+    profile_id = f'{time.strftime("%Y%m%dT%H%M%S")}-{uuid.uuid4().hex[:8]}'
+    path = os.path.join(directory, profile_id)
+    with open(path + '.collapsed', 'w') as f:
+        for stack, count in Counter(stacks).most_common():
+            f.write(f'{stack} {count}\n')
+    with open(path + '.json', 'w') as f:
+        json.dump(
+            dict(info, id=profile_id, samples=sum(stacks.values())),
+            f,
+            indent=2
+        )
+
+    return profile_id
+
+
+def list_profiles(directory):
+    # Return the info of the profiles in the directory, oldest first
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name)) as f:
+                profiles.append(json.load(f))
+
+    return profiles
+
+
+def read_stacks(directory, profile_id):
+    # Return the stack counts of a profile
+    stacks = Counter()
+    with open(os.path.join(directory, profile_id + '.collapsed')) as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                stacks[stack] += int(count)
+
+    return stacks
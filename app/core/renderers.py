@@ -0,0 +1,62 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    # Without orjson the renderer is the same as DRF's JSONRenderer.
+    orjson = None
+
+
+# Datetimes are passed on to DRF's encoder, as orjson formats them slightly
+# differently (+00:00 instead of Z), and non-string keys are allowed like in
+# the stdlib.
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if orjson else 0
+)
+
+# DRF escapes these two line separators, which are valid in JSON but not in
+# JavaScript string literals.
+LINE_SEPARATORS = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    # JSONRenderer encoding with orjson when it's installed, producing the
+    # same bytes as the stdlib json module would.
+    '''
+    Note
+    Anything orjson can't serialize natively (Decimal, datetimes, lazy
+    translations, querysets...) goes through DRF's own JSONEncoder.default,
+    so the COERCE_DECIMAL_TO_STRING and datetime formats match. Requests
+    for indented output and the non-compact/ASCII-only API settings are
+    left to the stdlib, as orjson only writes compact UTF-8. Unlike the
+    stdlib with STRICT_JSON, orjson writes NaN and Infinity as null.
+    '''
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or not self.compact or self.ensure_ascii
+                or self.get_indent(accepted_media_type or '',
+                                   renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=ORJSON_OPTIONS
+            )
+        except TypeError:
+            # e.g. integers over 64 bit, which orjson doesn't support.
+            return super().render(data, accepted_media_type, renderer_context)
+
+        for char, escaped in LINE_SEPARATORS:
+            if char in ret:
+                ret = ret.replace(char, escaped)
+
+        return ret
@@ -0,0 +1,271 @@
+import itertools
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.cache import bump_version
+from recipe.search import update_search_vectors
+
+
+SEED_PASSWORD = 'seed-pass'
+
+# Words the generated recipe titles are made of, so that search and
+# typeahead have something realistic to match.
+TITLE_WORDS = (
+    'chicken', 'beef', 'tofu', 'salmon', 'pasta', 'rice', 'curry', 'soup',
+    'salad', 'roast', 'spicy', 'garlic', 'lemon', 'ginger', 'tomato',
+    'mushroom', 'honey', 'smoked', 'crispy', 'creamy', 'baked', 'grilled',
+)
+
+
+# Characters escaped in COPY's text format.
+COPY_ESCAPES = str.maketrans({
+    '\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r',
+})
+
+
+def _copy_value(value):
+    # Format a database value as a field of COPY's text format
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, int):
+        return str(value)
+    return str(value).translate(COPY_ESCAPES)
+
+
+class _CopyStream:
+    # Read-only file object producing COPY's text format from an iterable
+    # of rows, so the rows are streamed instead of being built up front.
+
+    def __init__(self, rows):
+        self._lines = (
+            '\t'.join(map(_copy_value, row)) + '\n' for row in rows
+        )
+        self._buffer = ''
+
+    def read(self, size=-1):
+        chunks, length = [self._buffer], len(self._buffer)
+        while size < 0 or length < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            chunks.append(line)
+            length += len(line)
+        data = ''.join(chunks)
+        if size < 0:
+            size = len(data)
+        data, self._buffer = data[:size], data[size:]
+        return data
+
+    # psycopg2 can read either, depending on the version.
+    readline = read
+
+
+class RowWriter:
+    # Inserts rows of a model in batches of bulk_create. The rows are
+    # tuples with the values of the given fields (attnames), the other
+    # fields get their defaults.
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+
+    def write(self, model, fields, rows):
+        # Insert the rows and return how many there were
+        count = 0
+        rows = iter(rows)
+        while True:
+            batch = [
+                model(**dict(zip(fields, row)))
+                for row in itertools.islice(rows, self.batch_size)
+            ]
+            if not batch:
+                return count
+            model.objects.bulk_create(batch)
+            count += len(batch)
+
+
+class CopyWriter(RowWriter):
+    # Streams rows of a model into PostgreSQL with COPY, which skips most
+    # of the per row work of an INSERT.
+    '''
+    Note
+    The rows are copied as they are, so they have to hold values the
+    database accepts. The defaults of the other fields are worked out once
+    the way save() would (auto_now included) and repeated in every row.
+    The primary key is left to its sequence unless it's one of the fields.
+    '''
+
+    def write(self, model, fields, rows):
+        template = model()
+        defaults = [
+            field for field in model._meta.concrete_fields
+            if field.attname not in fields and field is not model._meta.pk
+        ]
+        extra = tuple(
+            field.get_db_prep_save(
+                field.pre_save(template, add=True), connection
+            )
+            for field in defaults
+        )
+        count = 0
+
+        def full_rows():
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row + extra
+
+        quote = connection.ops.quote_name
+        columns = [model._meta.get_field(name).column for name in fields] + \
+                  [field.column for field in defaults]
+        sql = 'COPY {} ({}) FROM STDIN'.format(
+            quote(model._meta.db_table),
+            ', '.join(map(quote, columns))
+        )
+        with connection.cursor() as cursor:
+            cursor.copy_expert(sql, _CopyStream(full_rows()), 65536)
+
+        return count
+
+
+def _next_id(model):
+    # The first free primary key after the existing rows
+    last = model.objects.aggregate(last=models.Max('pk'))
+    return (last['last'] or 0) + 1
+
+
+def seed_database(users=10, tags=20, ingredients=50, recipes=200,
+                  tags_per_recipe=3, ingredients_per_recipe=5, seed=0,
+                  password=SEED_PASSWORD, batch_size=5000, report=None):
+    # Insert users with their tags, ingredients and recipes and return the
+    # ids of the users. The same arguments always produce the same data.
+    # report(table, rows, seconds) is called after each table is filled.
+    '''
+    Note
+    The rows get explicit ids following the existing ones, which is what
+    lets the M2M tables be filled directly without reading the ids back.
+    On PostgreSQL the tables are locked against other writes while they're
+    filled, the rows are streamed with COPY and the sequences are moved
+    past the new ids afterwards. Everything else uses bulk_create.
+    All of the users share one password hash, so a user doesn't cost a
+    password hash. tags_per_recipe and ingredients_per_recipe set how
+    densely the M2M tables are filled (capped by the number of
+    tags/ingredients each user has).
+    '''
+    User = get_user_model()
+    postgres = connection.vendor == 'postgresql'
+    writer = (CopyWriter if postgres else RowWriter)(batch_size)
+    tables = [User, Tag, Ingredient, Recipe, Recipe.tags.through,
+              Recipe.ingredients.through]
+    tags_per_recipe = min(tags_per_recipe, tags)
+    ingredients_per_recipe = min(ingredients_per_recipe, ingredients)
+    password = make_password(password)
+
+    def fill(model, fields, rows):
+        start = time.perf_counter()
+        count = writer.write(model, fields, rows)
+        if report is not None:
+            report(model._meta.db_table, count, time.perf_counter() - start)
+
+    with transaction.atomic():
+        if postgres:
+            names = ', '.join(
+                connection.ops.quote_name(model._meta.db_table)
+                for model in tables
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'LOCK TABLE {names} IN SHARE ROW EXCLUSIVE MODE'
+                )
+        first_user, first_tag, first_ingredient, first_recipe = (
+            _next_id(model) for model in tables[:4]
+        )
+        user_ids = range(first_user, first_user + users)
+
+        fill(User, ('id', 'email', 'name', 'password'), (
+            (user_id, f'seed{user_id}@example.com', f'Seed {n}', password)
+            for n, user_id in enumerate(user_ids)
+        ))
+        fill(Tag, ('id', 'user_id', 'name'), (
+            (first_tag + n * tags + i, user_id, f'Tag {i}')
+            for n, user_id in enumerate(user_ids) for i in range(tags)
+        ))
+        fill(Ingredient, ('id', 'user_id', 'name'), (
+            (first_ingredient + n * ingredients + i, user_id,
+             f'Ingredient {i}')
+            for n, user_id in enumerate(user_ids)
+            for i in range(ingredients)
+        ))
+
+        def user_recipes():
+            for n, user_id in enumerate(user_ids):
+                # One generator per user and table keeps the data the same
+                # no matter in which order the tables are filled.
+                rng = random.Random(f'{seed}:recipes:{n}')
+                for i in range(recipes):
+                    title = ' '.join(rng.sample(TITLE_WORDS, 3))
+                    yield (
+                        first_recipe + n * recipes + i,
+                        user_id,
+                        title.capitalize(),
+                        rng.randint(5, 180),
+                        Decimal(rng.randint(100, 5000)) / 100,
+                        f'https://example.com/recipes/{i}',
+                    )
+
+        def links(field, first_related, per_user, per_recipe):
+            for n in range(users):
+                rng = random.Random(f'{seed}:{field}:{n}')
+                related_ids = range(first_related + n * per_user,
+                                    first_related + (n + 1) * per_user)
+                for i in range(recipes):
+                    recipe_id = first_recipe + n * recipes + i
+                    for related_id in rng.sample(related_ids, per_recipe):
+                        yield recipe_id, related_id
+
+        fill(Recipe, ('id', 'user_id', 'title', 'time_minutes', 'price',
+                      'link'), user_recipes())
+        fill(Recipe.tags.through, ('recipe_id', 'tag_id'), links(
+            'tag_id', first_tag, tags, tags_per_recipe
+        ))
+        fill(Recipe.ingredients.through, ('recipe_id', 'ingredient_id'), links(
+            'ingredient_id', first_ingredient, ingredients,
+            ingredients_per_recipe
+        ))
+
+        if postgres:
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), tables
+                ):
+                    cursor.execute(sql)
+                # Without statistics on the new rows the planner picks
+                # poor plans for the search_vector updates below.
+                cursor.execute('ANALYZE {}'.format(names))
+
+        # The inserts don't send the signals keeping search_vector current.
+        start = time.perf_counter()
+        first, last = first_recipe, first_recipe + users * recipes
+        for low in range(first, last, batch_size):
+            update_search_vectors(Recipe.objects.filter(
+                pk__gte=low, pk__lt=min(low + batch_size, last)
+            ).values('pk'))
+        if report is not None and postgres:
+            report('search vectors', last - first,
+                   time.perf_counter() - start)
+
+        # Nor the ones bumping the users' cache versions. The ids follow
+        # the highest existing one, so they can be those of deleted users
+        # whose responses are still cached.
+        for user_id in user_ids:
+            bump_version(user_id)
+
+    return user_ids
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from core.authentication import token_cache
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    # Forget a token as soon as it's regenerated or deleted
+    token_cache.delete_many([instance.key])
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user_tokens(sender, instance, created=False, **kwargs):
+    # Forget the user's tokens when the user changes, the cached user
+    # object could be stale (e.g. is_active flipped to False).
+    if created:
+        # A brand new user can't have any cached tokens yet.
+        return
+    keys = Token.objects.filter(user_id=instance.pk).values_list(
+        'key', flat=True
+    )
+    token_cache.delete_many(list(keys))
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import LocalTokenCache, SharedTokenCache, \
+                                _build_token_cache, token_cache
+
+
+ME_URL = reverse('user:me')
+
+
+class LocalTokenCacheTests(TestCase):
+
+    def test_evicts_least_recently_used(self):
+        # Test the cache doesn't grow above its max size
+        cache = LocalTokenCache(max_size=2, timeout=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_expired_entries_are_dropped(self):
+        # Test entries are not returned after their time to live
+        cache = LocalTokenCache(max_size=2, timeout=-1)
+        cache.set('a', 1)
+
+        self.assertIsNone(cache.get('a'))
+
+    def test_local_cache_expires_quickly(self):
+        # Test the per-process cache, which other processes can't
+        # invalidate, only keeps entries for LOCAL_TIMEOUT seconds
+        config = {'BACKEND': None, 'TIMEOUT': 300, 'LOCAL_TIMEOUT': 5}
+        with override_settings(TOKEN_AUTH_CACHE=config):
+            cache = _build_token_cache()
+        self.assertIsInstance(cache, LocalTokenCache)
+        self.assertEqual(cache.timeout, 5)
+
+        config['BACKEND'] = 'api'
+        with override_settings(TOKEN_AUTH_CACHE=config):
+            cache = _build_token_cache()
+        self.assertIsInstance(cache, SharedTokenCache)
+        self.assertEqual(cache.timeout, 300)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeat_requests_skip_token_query(self):
+        # Test the token lookup only hits the database once
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_deleted_token_is_rejected(self):
+        # Test that deleting a token invalidates the cached entry
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        # Test that deactivating a user invalidates the cached entry
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
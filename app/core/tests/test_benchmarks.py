@@ -0,0 +1,76 @@
+from django.db import transaction
+from django.test import TestCase
+
+from core.benchmarks import compare_results, generate_dataset, percentile
+from core.models import Recipe
+
+
+class BenchmarkTests(TestCase):
+
+    def _snapshot(self, **params):
+        # Generate a dataset and return its recipes with their tags and
+        # ingredients, then throw it away again.
+        with transaction.atomic():
+            users = generate_dataset(**params)
+            recipes = Recipe.objects.filter(
+                user__in=users
+            ).with_related_names().order_by('id')
+            snapshot = [
+                (recipe.user.email, recipe.title, recipe.time_minutes,
+                 recipe.price, sorted(t.name for t in recipe.tags.all()),
+                 sorted(i.name for i in recipe.ingredients.all()))
+                for recipe in recipes
+            ]
+            transaction.set_rollback(True)
+
+        return snapshot
+
+    def test_generate_dataset(self):
+        # Test the dataset has the requested size and M2M density
+        users = generate_dataset(users=2, tags=4, ingredients=6, recipes=5,
+                                 tags_per_recipe=2, ingredients_per_recipe=8)
+
+        self.assertEqual(len(users), 2)
+        for user in users:
+            self.assertEqual(user.tag_set.count(), 4)
+            self.assertEqual(user.ingredient_set.count(), 6)
+            recipes = Recipe.objects.filter(user=user)
+            self.assertEqual(recipes.count(), 5)
+            for recipe in recipes:
+                self.assertEqual(recipe.tags.count(), 2)
+                # Capped by the number of ingredients there are.
+                self.assertEqual(recipe.ingredients.count(), 6)
+
+    def test_generate_dataset_deterministic(self):
+        # Test the same seed gives the same data and another seed doesn't
+        params = {'users': 2, 'tags': 5, 'recipes': 4}
+
+        first = self._snapshot(seed=1, **params)
+
+        self.assertEqual(first, self._snapshot(seed=1, **params))
+        self.assertNotEqual(first, self._snapshot(seed=2, **params))
+
+    def test_percentile(self):
+        values = [5, 1, 4, 2, 3]
+
+        self.assertEqual(percentile(values, 50), 3)
+        self.assertEqual(percentile(values, 100), 5)
+        self.assertEqual(percentile(values, 95), 4.8)
+
+    def test_compare_results(self):
+        # Test only changes beyond the thresholds are reported
+        baseline = {
+            'fast': {'p95_ms': 10, 'queries': 2, 'peak_memory_kib': 100},
+            'slow': {'p95_ms': 10, 'queries': 2, 'peak_memory_kib': 100},
+            'gone': {'p95_ms': 10, 'queries': 2, 'peak_memory_kib': 100},
+        }
+        results = {
+            'fast': {'p95_ms': 11, 'queries': 2, 'peak_memory_kib': 140},
+            'slow': {'p95_ms': 13, 'queries': 3, 'peak_memory_kib': 160},
+        }
+
+        regressions = compare_results(results, baseline, latency=0.2,
+                                      queries=0, memory=0.5)
+
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(all(r.startswith('slow:') for r in regressions))
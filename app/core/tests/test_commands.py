@@ -1,8 +1,21 @@
+import io
+import json
+import os
+import tempfile
 from unittest.mock import patch
 
+# PIL is the Pillow library.
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+
+from core.models import Recipe, RecipeImageVariant
 
 
 # Uses Mocking to test the database.
@@ -12,20 +25,138 @@ class CommandsTestCase(TestCase):
         # Test to wait for the db to become available.
         # Checks whether an OperationalError is retrieved. If so,
         # then a DB isn't available.
-        # We're going to override the ConnectionHandler.
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
+        # We're going to override the connection so it doesn't need a
+        # real database.
+        with patch('core.management.commands.wait_for_db.connections') as cs:
+            db_conn = cs.__getitem__.return_value
             call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+            self.assertEqual(db_conn.ensure_connection.call_count, 1)
+            db_conn.cursor.return_value.__enter__.return_value.execute \
+                .assert_called_once_with('SELECT 1')
 
     @patch('time.sleep', return_value=None)
     def test_wait_for_db(self, ts):
         # Test to wait for the db. Will check 5 times, and a 6th.
 
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+        with patch('core.management.commands.wait_for_db.connections') as cs:
+            db_conn = cs.__getitem__.return_value
             # Python unittest module allows you to set a side effect
             # to the function you're mocking.
             # Raises OperationalError 5 times, on the 6th - call completes.
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+            db_conn.ensure_connection.side_effect = \
+                [OperationalError] * 5 + [None]
+            call_command('wait_for_db', interval=1, max_interval=4)
+            self.assertEqual(db_conn.ensure_connection.call_count, 6)
+
+        # The waits back off exponentially (with jitter) up to the maximum.
+        delays = [call[0][0] for call in ts.call_args_list]
+        self.assertEqual(len(delays), 5)
+        for delay, ceiling in zip(delays, [1, 2, 4, 4, 4]):
+            self.assertGreaterEqual(delay, ceiling / 2)
+            self.assertLessEqual(delay, ceiling)
+
+    @patch('time.sleep', return_value=None)
+    def test_wait_for_db_timeout(self, ts):
+        # Test the command gives up once the deadline has passed
+        with patch('core.management.commands.wait_for_db.connections') as cs:
+            db_conn = cs.__getitem__.return_value
+            db_conn.ensure_connection.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0)
+
+    @patch('time.sleep', return_value=None)
+    def test_wait_for_db_migrations(self, ts):
+        # Test the command waits until the migrations are applied
+        with patch('core.management.commands.wait_for_db.connections'), \
+                patch(
+                    'core.management.commands.wait_for_db.Command.'
+                    '_pending_migrations',
+                    side_effect=[2, 0]
+                ) as pending:
+            call_command('wait_for_db', migrations=True)
+            self.assertEqual(pending.call_count, 2)
+
+    def test_backfill_recipe_image_variants(self):
+        # Test variants are rendered once for images that lack them
+        user = get_user_model().objects.create_user('test@test.com', 'pass')
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Pancakes',
+            time_minutes=5,
+            price=3.00,
+            image='uploads/recipe/backfill-test.jpg',
+            image_status=Recipe.IMAGE_READY
+        )
+        path = default_storage.path(recipe.image.name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new('RGB', (300, 300)).save(path, format='JPEG')
+        self.addCleanup(default_storage.delete, recipe.image.name)
+
+        with self.settings(RECIPE_IMAGE_VARIANT_SIZES=(64,)):
+            call_command('backfill_recipe_image_variants', workers=2)
+            call_command('backfill_recipe_image_variants', workers=1)
+
+        for rendered in recipe.image_variants.all():
+            self.addCleanup(default_storage.delete, rendered.image.name)
+        variant = RecipeImageVariant.objects.get(
+            recipe=recipe,
+            format=RecipeImageVariant.JPEG
+        )
+        self.assertEqual((variant.width, variant.height), (64, 64))
+        self.assertTrue(os.path.exists(variant.image.path))
+
+    def test_benchmark_json(self):
+        # Test the JSON benchmark reports identical output and leaves no data
+        out = io.StringIO()
+        call_command('benchmark_json', recipes=3, repeat=1, stdout=out)
+
+        self.assertIn('3 recipes', out.getvalue())
+        self.assertNotIn('differs', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_api(self):
+        # Test the API benchmark writes its results and leaves no data
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'results.json')
+            call_command(
+                'benchmark_api', users=2, recipes=3, repeat=2, warmup=0,
+                endpoint=['recipes-list', 'user-me'], output=output,
+                stdout=io.StringIO()
+            )
+            with open(output) as f:
+                results = json.load(f)['results']
+
+            self.assertEqual(set(results), {'recipes-list', 'user-me'})
+            self.assertEqual(results['recipes-list']['status'], 200)
+            self.assertGreater(results['recipes-list']['queries'], 0)
+            self.assertFalse(Recipe.objects.exists())
+
+            # Fewer queries in the baseline than now is a regression.
+            results['recipes-list']['queries'] -= 1
+            baseline = os.path.join(tmp, 'baseline.json')
+            with open(baseline, 'w') as f:
+                json.dump({'results': results}, f)
+            with self.assertRaises(CommandError):
+                call_command(
+                    'benchmark_api', users=2, recipes=3, repeat=2, warmup=0,
+                    endpoint=['recipes-list'], baseline=baseline,
+                    latency_threshold=100, memory_threshold=100,
+                    stdout=io.StringIO(), stderr=io.StringIO()
+                )
+
+    def test_benchmark_hashers(self):
+        # Test the hashers are timed and the outdated hashes counted
+        user = get_user_model().objects.create_user('a@test.com', 'pass')
+        user.password = make_password('pass', hasher='pbkdf2_sha1')
+        user.save()
+        get_user_model().objects.create_user('b@test.com', 'pass')
+        get_user_model().objects.create_user('c@test.com')
+
+        out = io.StringIO()
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            call_command('benchmark_hashers', repeat=1, target_ms=10,
+                         stdout=out)
+
+        self.assertIn('pbkdf2_sha256 *', out.getvalue())
+        self.assertIn('PASSWORD_HASH_ITERATIONS=', out.getvalue())
+        self.assertIn('2 of 2 stored hashes will be upgraded', out.getvalue())
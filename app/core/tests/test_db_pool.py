@@ -0,0 +1,69 @@
+from unittest.mock import Mock, patch
+
+from django.db import connection
+from django.db.utils import OperationalError
+from django.test import TestCase
+
+from core.db.pool import ConnectionPool
+
+
+def fake_connect():
+    # Stand in for opening a database connection
+    return Mock(closed=0)
+
+
+class ConnectionPoolTests(TestCase):
+
+    def test_reuses_checked_in_connection(self):
+        # Test a connection given back is handed out again
+        pool = ConnectionPool(size=1, timeout=0)
+        conn = pool.checkout(fake_connect)
+        pool.checkin(conn)
+
+        self.assertIs(pool.checkout(fake_connect), conn)
+        self.assertEqual(pool.stats['checkouts'], 2)
+        self.assertEqual(pool.stats['opened'], 1)
+
+    def test_waits_then_times_out_when_exhausted(self):
+        # Test checking out more connections than the pool size fails
+        pool = ConnectionPool(size=1, timeout=0.01)
+        pool.checkout(fake_connect)
+
+        with self.assertRaises(OperationalError):
+            pool.checkout(fake_connect)
+        self.assertEqual(pool.stats['waits'], 1)
+        self.assertEqual(pool.stats['timeouts'], 1)
+
+    def test_recycles_broken_and_old_connections(self):
+        # Test unusable or expired connections are closed, not reused
+        pool = ConnectionPool(size=2, timeout=0, max_age=0)
+        broken = pool.checkout(fake_connect)
+        old = pool.checkout(fake_connect)
+        pool.checkin(broken, usable=False)
+        pool.checkin(old)
+
+        conn = pool.checkout(fake_connect)
+
+        self.assertIsNot(conn, old)
+        broken.close.assert_called_once_with()
+        old.close.assert_called_once_with()
+        self.assertEqual(pool.stats['recycled'], 2)
+
+
+class HealthCheckTests(TestCase):
+
+    def test_unusable_connection_is_replaced(self):
+        # Test a dead persistent connection is closed before it's used
+        if not hasattr(connection, 'health_check_done'):
+            self.skipTest('Needs the core PostgreSQL backend')
+        connection.ensure_connection()
+        connection.health_check_done = False
+        settings_dict = dict(connection.settings_dict, CONN_HEALTH_CHECKS=True)
+
+        with patch.object(connection, 'settings_dict', settings_dict), \
+                patch.object(connection, 'in_atomic_block', False), \
+                patch.object(connection, 'is_usable', return_value=False), \
+                patch.object(connection, 'close') as close:
+            connection.ensure_connection()
+
+        close.assert_called_once_with()
@@ -0,0 +1,130 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.metrics import Histogram, registry
+from core.middleware import InstrumentationMiddleware
+
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def run_queries(*sqls):
+    # View running the given SQL queries
+    def view(request):
+        with connection.cursor() as cursor:
+            for sql in sqls:
+                cursor.execute(sql)
+        return HttpResponse()
+
+    return view
+
+
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        registry.reset()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        # Test API responses report their database and total time
+        res = self.client.get(RECIPES_URL)
+
+        timing = res['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries')
+        self.assertRegex(timing, r'total;dur=[\d.]+')
+
+    def test_duplicate_queries_counted(self):
+        # Test queries repeated with the same parameters are counted
+        middleware = InstrumentationMiddleware(
+            run_queries('SELECT 1', 'SELECT 2', 'SELECT 1', 'SELECT 1')
+        )
+
+        res = middleware(RequestFactory().get('/'))
+
+        self.assertIn('"4 queries, 2 duplicates"', res['Server-Timing'])
+
+    @override_settings(INSTRUMENTATION={'SAMPLE_RATE': 0})
+    def test_unsampled_requests_not_recorded(self):
+        # Test nothing is recorded for requests left out of the sample
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertNotIn(
+            'view="recipe:recipe-list"',
+            self.client.get(METRICS_URL).content.decode()
+        )
+
+    @override_settings(INSTRUMENTATION={'LOG': True})
+    def test_request_logged(self):
+        # Test every recorded request is logged as a JSON line
+        with self.assertLogs('api.requests', 'INFO') as logs:
+            self.client.get(RECIPES_URL)
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['view'], 'recipe:recipe-list')
+        self.assertEqual(entry['status'], 200)
+        self.assertGreater(entry['queries'], 0)
+
+    def test_metrics_endpoint(self):
+        # Test the per view histograms are served in the Prometheus format
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        self.assertIn('# TYPE api_request_duration_seconds histogram', body)
+        self.assertIn(
+            'api_request_duration_seconds_count'
+            '{view="recipe:recipe-list",method="GET"} 2',
+            body
+        )
+        self.assertIn(
+            'api_responses_total'
+            '{view="recipe:recipe-list",method="GET",status="200"} 2',
+            body
+        )
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_metrics_endpoint_internal(self):
+        # Test the metrics aren't served to other addresses
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 404)
+
+
+class HistogramTests(TestCase):
+
+    def test_render_histogram(self):
+        # Test the buckets are cumulative and end with +Inf
+        histogram = Histogram('latency', 'Latency.', ('view',), (1, 5))
+        for value in (0.5, 3, 3, 10):
+            histogram.observe(value, 'a"b')
+
+        lines = [
+            f'{histogram.name}{suffix} {labels} {value}'
+            for suffix, labels, value in histogram.samples()
+        ]
+
+        self.assertEqual([line.rsplit(' ', 1)[1] for line in lines],
+                         ['1', '3', '4', '4', '16.5'])
+        self.assertIn('+Inf', lines[2])
+        self.assertIn(
+            'latency_bucket{view="a\\"b",le="5"} 3',
+            registry.render(extra=[histogram])
+        )
@@ -0,0 +1,108 @@
+import datetime
+import io
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import parsers, renderers
+from core.models import Ingredient, Recipe, Tag
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+from recipe.serializers import RecipeDetailSerializer
+
+
+class FastJSONRendererTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+
+    def assertSameOutput(self, data, media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type)
+        )
+
+    def test_renders_recipe_detail_like_stdlib(self):
+        # Test serialized recipes are rendered to the same bytes
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Crème brûlée \u2028\u2029 ünïcode',
+            time_minutes=45,
+            price=Decimal('12.50')
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Dessert'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Cream')
+        )
+        data = RecipeDetailSerializer(recipe).data
+
+        self.assertSameOutput(data)
+        self.assertSameOutput([data, data])
+
+    def test_renders_python_types_like_stdlib(self):
+        # Test Decimal, datetimes and non-string keys match the stdlib
+        data = {
+            'price': Decimal('5.10'),
+            'aware': timezone.now(),
+            'naive': datetime.datetime(2020, 1, 2, 3, 4, 5, 6),
+            'date': datetime.date(2020, 1, 2),
+            'time': datetime.time(3, 4, 5),
+            'delta': datetime.timedelta(minutes=5),
+            1: 'one',
+        }
+
+        self.assertSameOutput(data)
+
+    def test_indent_uses_stdlib(self):
+        # Test indented output is still supported
+        self.assertSameOutput({'a': [1, 2]}, 'application/json; indent=4')
+
+    def test_renders_none_as_empty(self):
+        # Test no data renders an empty body
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_falls_back_without_orjson(self):
+        # Test the stdlib is used when orjson isn't installed
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertSameOutput({'price': Decimal('1.00')})
+
+
+class FastJSONParserTests(TestCase):
+
+    def parse(self, body):
+        return FastJSONParser().parse(io.BytesIO(body))
+
+    def test_parses_like_stdlib(self):
+        # Test the parser returns the same data as JSONParser
+        body = '{"title": "Crème", "tags": [1, 2], "price": "5.00"}'.encode()
+
+        self.assertEqual(
+            self.parse(body),
+            JSONParser().parse(io.BytesIO(body))
+        )
+
+    def test_invalid_json(self):
+        # Test a malformed body raises a parse error
+        with self.assertRaises(ParseError):
+            self.parse(b'{"title": ')
+
+    @skipIf(parsers.orjson is None, 'orjson is not installed')
+    def test_other_encodings_use_stdlib(self):
+        # Test bodies that aren't UTF-8 are still decoded
+        body = '{"title": "Crème"}'.encode('latin-1')
+        data = FastJSONParser().parse(
+            io.BytesIO(body),
+            parser_context={'encoding': 'latin-1'}
+        )
+
+        self.assertEqual(data, {'title': 'Crème'})
@@ -0,0 +1,164 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.profiling import Sampler, list_profiles, read_stacks, \
+                           write_profile
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def busy_loop(seconds):
+    # Keep the thread running Python code for a while
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class ProfilingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_user(
+            'staff@test.com',
+            'testpass',
+            is_staff=True
+        )
+        self.user = get_user_model().objects.create_user(
+            'user@test.com',
+            'testpass'
+        )
+
+    def _settings(self, **config):
+        return override_settings(PROFILING=dict({
+            'ENABLED': True,
+            'SAMPLE_RATE': 0,
+            'INTERVAL': 0.001,
+            'DIRECTORY': self.directory,
+        }, **config))
+
+    def _authenticate(self, user):
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_profile_requested_by_staff(self):
+        # Test a staff user's request is profiled when asked for
+        self._authenticate(self.staff)
+        with self._settings():
+            res = self.client.get(RECIPES_URL, {'profile': '1'})
+            res_header = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, 200)
+        profiles = list_profiles(self.directory)
+        self.assertEqual(
+            [p['id'] for p in profiles],
+            sorted([res['X-Profile-Id'], res_header['X-Profile-Id']])
+        )
+        self.assertEqual(profiles[0]['view'], 'recipe:recipe-list')
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory, res['X-Profile-Id'] + '.collapsed')
+        ))
+
+    def test_profile_requested_by_other_user(self):
+        # Test other users can't ask for a profile
+        self._authenticate(self.user)
+        with self._settings():
+            res = self.client.get(RECIPES_URL, {'profile': '1'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertEqual(list_profiles(self.directory), [])
+
+    def test_profiling_disabled(self):
+        # Test nothing is profiled unless profiling is enabled
+        self._authenticate(self.staff)
+        with self._settings(ENABLED=False):
+            res = self.client.get(RECIPES_URL, {'profile': '1'})
+
+        self.assertNotIn('X-Profile-Id', res)
+
+    def test_profile_sampled(self):
+        # Test the sampled requests are profiled without being asked
+        with self._settings(SAMPLE_RATE=1):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, 401)
+        self.assertIn('X-Profile-Id', res)
+
+
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_sampler(self):
+        # Test the sampled stacks run from the outermost frame to the
+        # function that was running
+        sampler = Sampler(interval=0.001).start()
+        busy_loop(0.05)
+        stacks = sampler.stop()
+
+        self.assertGreater(sum(stacks.values()), 0)
+        stack = stacks.most_common(1)[0][0].split(';')
+        self.assertIn('busy_loop (core/tests/test_profiling.py:', stack[-1])
+        self.assertIn('test_sampler', stack[-2])
+
+    def test_profiles_command(self):
+        # Test the profiles are listed and their stacks added up
+        first = write_profile(self.directory, {'a;b': 2, 'a;c': 1}, {
+            'time': 0, 'method': 'GET', 'path': '/', 'view': 'one',
+            'status': 200, 'duration_ms': 5, 'interval': 0.001,
+        })
+        write_profile(self.directory, {'a;b': 3}, {
+            'time': 0, 'method': 'GET', 'path': '/', 'view': 'two',
+            'status': 200, 'duration_ms': 50, 'interval': 0.001,
+        })
+        self.assertEqual(read_stacks(self.directory, first),
+                         {'a;b': 2, 'a;c': 1})
+
+        out = io.StringIO()
+        call_command('profiles', directory=self.directory, stdout=out)
+        self.assertIn(first, out.getvalue())
+        self.assertIn('two', out.getvalue())
+
+        out = io.StringIO()
+        call_command('profiles', directory=self.directory, aggregate=True,
+                     top=1, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[:2], ['a;b 5', 'a;c 1'])
+        self.assertIn('83.3%  b', lines[-1])
+
+        output = os.path.join(self.directory, 'slow.collapsed')
+        call_command('profiles', directory=self.directory, aggregate=True,
+                     min_duration=10, output=output, stdout=io.StringIO())
+        with open(output) as f:
+            self.assertEqual(f.read(), 'a;b 3\n')
+
+    def test_profiles_command_no_profiles(self):
+        with self.assertRaises(CommandError):
+            call_command('profiles', directory=self.directory,
+                         stdout=io.StringIO())
+
+    def test_write_profile_info(self):
+        # Test the info about the request is stored with the sample count
+        profile_id = write_profile(self.directory, {'a': 4}, {'view': 'x'})
+
+        with open(os.path.join(self.directory, profile_id + '.json')) as f:
+            info = json.load(f)
+        self.assertEqual(info, {'view': 'x', 'id': profile_id, 'samples': 4})
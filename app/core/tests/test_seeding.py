@@ -0,0 +1,105 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from core.seeding import _CopyStream, seed_database
+
+
+class SeedingTests(TestCase):
+
+    def test_seed_data(self):
+        # Test the command inserts the requested rows after existing ones
+        existing = get_user_model().objects.create_user('test@test.com', 'p')
+        Recipe.objects.create(user=existing, title='Old', time_minutes=5,
+                              price=1)
+        out = io.StringIO()
+
+        call_command('seed_data', users=3, tags=4, ingredients=5, recipes=6,
+                     tags_per_recipe=2, ingredients_per_recipe=3,
+                     password='secret', stdout=out)
+
+        users = get_user_model().objects.exclude(pk=existing.pk)
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(Tag.objects.count(), 12)
+        self.assertEqual(Ingredient.objects.count(), 15)
+        self.assertEqual(Recipe.objects.filter(user__in=users).count(), 18)
+        self.assertEqual(Recipe.tags.through.objects.count(), 36)
+        self.assertEqual(Recipe.ingredients.through.objects.count(), 54)
+        for user in users:
+            self.assertTrue(user.check_password('secret'))
+        self.assertIn('rows/s', out.getvalue())
+
+    def test_seed_database_links_own_objects(self):
+        # Test recipes are only linked to their own user's objects
+        user_ids = seed_database(users=2, tags=3, ingredients=3, recipes=4)
+
+        for recipe in Recipe.objects.filter(user_id__in=user_ids):
+            self.assertEqual(
+                {tag.user_id for tag in recipe.tags.all()}, {recipe.user_id}
+            )
+            self.assertEqual(
+                {i.user_id for i in recipe.ingredients.all()},
+                {recipe.user_id}
+            )
+
+    def test_seed_database_continues_sequences(self):
+        # Test objects created after seeding get new ids
+        user_ids = seed_database(users=1, tags=2, ingredients=2, recipes=2)
+        user = get_user_model().objects.get(pk=user_ids[0])
+
+        tag = Tag.objects.create(user=user, name='New')
+        recipe = Recipe.objects.create(user=user, title='New',
+                                       time_minutes=5, price=1)
+        recipe.tags.add(tag)
+
+        self.assertEqual(recipe.tags.count(), 1)
+        if connection.vendor == 'postgresql':
+            # The recipes are searchable straight away.
+            self.assertFalse(
+                Recipe.objects.filter(search_vector__isnull=True)
+                .exclude(pk=recipe.pk).exists()
+            )
+
+    def test_seed_database_reused_ids_not_cached(self):
+        # Test a seeded user reusing a deleted user's id doesn't get the
+        # responses cached for the deleted user
+        get_user_model().objects.create_user('old@test.com', 'p')
+        user = get_user_model().objects.create_user('test@test.com', 'p')
+        client = APIClient()
+        client.force_authenticate(user)
+        self.assertEqual(client.get(reverse('recipe:recipe-list')).data, [])
+        user_id = user.pk
+        user.delete()
+
+        user_ids = seed_database(users=1, tags=2, ingredients=2, recipes=2)
+        self.assertEqual(user_ids[0], user_id)
+        client.force_authenticate(
+            get_user_model().objects.get(pk=user_ids[0])
+        )
+        res = client.get(reverse('recipe:recipe-list'))
+
+        self.assertEqual(len(res.data), 2)
+
+    def test_copy_stream(self):
+        # Test rows are escaped for COPY and read back in any chunk size
+        stream = _CopyStream([
+            [1, 'tab\there', None],
+            [2, 'back\\slash\nline', True],
+        ])
+        expected = '1\ttab\\there\t\\N\n2\tback\\\\slash\\nline\tt\n'
+
+        chunks = []
+        while True:
+            chunk = stream.read(5)
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+        self.assertEqual(''.join(chunks), expected)
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from core.db.pool import pool_stats
+from core.metrics import Counter, registry
+
+
+def _pool_metrics():
+    # The counters of the database connection pools of this process
+    counter = Counter(
+        'api_db_pool_events_total',
+        'Connection pool checkouts, waits, timeouts, opens and recycles.',
+        ('pool', 'event')
+    )
+    for key, stats in pool_stats().items():
+        for event, count in stats.items():
+            counter.inc(key, event, amount=count)
+
+    return counter
+
+
+def metrics(request):
+    # Serve the request metrics (see core.middleware) in the Prometheus
+    # text format. The endpoint is internal, so any address that isn't in
+    # METRICS_ALLOWED_IPS gets a 404.
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        raise Http404
+
+    return HttpResponse(
+        registry.render(extra=[_pool_metrics()]),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,46 @@
+# Gunicorn configuration for running the API in production, e.g.
+#     gunicorn -c gunicorn.conf.py app.wsgi
+# Every setting can be overridden through the environment.
+# Gunicorn settings documentation -
+# https://docs.gunicorn.org/en/19.9.0/settings.html
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# The usual (2 x cores) + 1 pre-forked workers keeps every core busy while
+# some of the workers are waiting on the database.
+workers = int(os.environ.get(
+    'GUNICORN_WORKERS',
+    multiprocessing.cpu_count() * 2 + 1
+))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+# Only used by the threaded (gthread) worker class.
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+# Restart a worker after it has served this many requests, so any memory
+# it slowly accumulates is given back. The jitter keeps the workers from
+# all restarting at the same time.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Kill workers stuck on a request for longer than this many seconds.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+# On SIGTERM workers get this many seconds to finish their requests.
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Load Django once in the master before forking, so the workers share the
+# loaded code copy-on-write instead of each importing it again.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # Django doesn't connect to the database while loading, but make sure a
+    # worker never shares a connection opened in the master.
+    from django.db import connections
+
+    connections.close_all()
@@ -0,0 +1,83 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipe.conditional import ConditionalResponseMixin
+
+
+def _cache():
+    return caches[settings.RECIPE_API_CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f'recipe-api:version:{user_id}'
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def get_version(user_id):
+    # Return the current version of a user's recipe data.
+    '''
+    Note
+    The version is the time (in ms) of the user's last change, so it also
+    gives us the Last-Modified header. If the counter got evicted it starts
+    again from the current time, which is newer than anything cached before.
+    '''
+    cache = _cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), _now_ms(), None)
+        version = cache.get(_version_key(user_id), _now_ms())
+
+    return version
+
+
+def _bump(user_id):
+    cache = _cache()
+    current = cache.get(_version_key(user_id), 0)
+    cache.set(_version_key(user_id), max(current + 1, _now_ms()), None)
+
+
+def bump_version(user_id):
+    # Invalidate everything cached for the user, without having to find
+    # the keys: from now on they're looked up under a new version.
+    _bump(user_id)
+    # A request running while the change isn't committed yet can still
+    # cache the old data under the new version, so bump again once the
+    # change is visible to everyone.
+    transaction.on_commit(lambda: _bump(user_id))
+
+
+class CachedResponseMixin(ConditionalResponseMixin):
+    # Caches the list and retrieve responses of a viewset per user, and
+    # takes the ETag/Last-Modified of conditional requests from the user's
+    # version instead of querying the database.
+
+    def get_response_state(self, request):
+        self.cache_version = get_version(request.user.pk)
+        return str(self.cache_version), self.cache_version // 1000
+
+    def get_full_response(self, request, view, *args, **kwargs):
+        # The ETag covers the user, version, path and format.
+        etag = self.get_etag(request, str(self.cache_version))
+        key = f'recipe-api:response:{request.user.pk}:{etag}'
+        data = _cache().get(key)
+        if data is not None:
+            return Response(data)
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            _cache().set(key, response.data)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(
+            request, super().retrieve, *args, **kwargs
+        )
@@ -0,0 +1,80 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class ConditionalResponseMixin:
+    # Answers conditional GET requests (If-None-Match/If-Modified-Since)
+    # of a viewset's list action with 304 Not Modified.
+    '''
+    Note
+    The ETag isn't a hash of the response body, which would mean running
+    the queries and serializing it first. It's derived from the number of
+    objects the request would return and when the newest of them was last
+    updated, which a single aggregate query gives us without loading any
+    rows. Adding, changing or removing an object changes one of the two.
+    '''
+
+    def get_response_state(self, request):
+        # Return (state, last modified timestamp or None) of the response
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            queryset = queryset.filter(pk=self.kwargs['pk'])
+        # The ordering and prefetching of the queryset are of no use here.
+        state = queryset.order_by().aggregate(
+            count=Count('pk'),
+            last_updated=Max('updated_at')
+        )
+        last_updated = state['last_updated']
+        last_modified = None
+        if last_updated is not None:
+            last_modified = int(last_updated.timestamp())
+
+        return f'{state["count"]}:{last_updated}', last_modified
+
+    def get_etag(self, request, state):
+        # Responses vary by user, path (including the query string) and
+        # format, as well as by the state of the data.
+        key = ':'.join([
+            str(request.user.pk),
+            request.accepted_renderer.format,
+            request.get_full_path(),
+            state,
+        ])
+        return f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+    def get_full_response(self, request, view, *args, **kwargs):
+        # Build the response when the client's copy is out of date
+        return view(request, *args, **kwargs)
+
+    def _conditional_response(self, request, view, *args, **kwargs):
+        state, last_modified = self.get_response_state(request)
+        etag = self.get_etag(request, state)
+
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified
+        )
+        if response is None:
+            response = self.get_full_response(request, view, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # The response depends on who's asking, shared caches can't keep it.
+        response['Cache-Control'] = 'private, no-cache'
+        response['Vary'] = 'Authorization'
+        return response
+
+    # Only list is wrapped here, defining retrieve would make the router
+    # add a detail route to viewsets that don't have one. Viewsets that do
+    # can wrap it the same way.
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(
+            request, super().list, *args, **kwargs
+        )
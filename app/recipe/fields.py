@@ -0,0 +1,97 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    # PrimaryKeyRelatedField only accepting the request user's objects.
+    # With many=True all of the ids are looked up in one query, see
+    # BatchedManyRelatedField.
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is not None:
+            queryset = queryset.filter(user=request.user)
+        return queryset
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchedManyRelatedField(**list_kwargs)
+
+
+class BatchedManyRelatedField(serializers.ManyRelatedField):
+    # ManyRelatedField validating all of its ids with a single
+    # filter(pk__in=...) query instead of one get() per id.
+    '''
+    Note
+    The ids that don't exist (or belong to another user) are all reported
+    at once. BulkListSerializer calls prefetch() with the ids of the whole
+    batch first, so a batch costs one query per field rather than one per
+    item.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prefetched = None
+
+    def _to_pk(self, value):
+        # Convert a submitted id to the model's primary key type
+        pk_field = self.child_relation.queryset.model._meta.pk
+        try:
+            return pk_field.to_python(value)
+        except DjangoValidationError:
+            self.child_relation.fail(
+                'incorrect_type',
+                data_type=type(value).__name__
+            )
+
+    def _fetch(self, pks):
+        # Map each of the pks that exist to its object
+        queryset = self.child_relation.get_queryset()
+        return {obj.pk: obj for obj in queryset.filter(pk__in=pks)}
+
+    def prefetch(self, values):
+        # Look up the objects of every id in values (lists of submitted ids)
+        # so validating them doesn't query the database again.
+        pks = set()
+        for data in values:
+            if isinstance(data, str) or not hasattr(data, '__iter__'):
+                continue
+            for value in data:
+                try:
+                    pks.add(self._to_pk(value))
+                except serializers.ValidationError:
+                    continue
+        self._prefetched = self._fetch(pks)
+
+    def clear_prefetched(self):
+        self._prefetched = None
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        # Drop repeated ids, keeping the order they were sent in.
+        pks = list(dict.fromkeys(self._to_pk(value) for value in data))
+        objects = self._prefetched
+        if objects is None:
+            objects = self._fetch(pks) if pks else {}
+
+        missing = [pk for pk in pks if pk not in objects]
+        if missing:
+            raise serializers.ValidationError([
+                self.child_relation.error_messages['does_not_exist'].format(
+                    pk_value=pk
+                )
+                for pk in missing
+            ])
+
+        return [objects[pk] for pk in pks]
@@ -0,0 +1,184 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, Count, Exists, FloatField, IntegerField, \
+                             OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Upper
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+
+
+# Query parameter, lookup and the field validating the value of the range
+# filters of the recipes endpoint. All of them are on Recipe's own columns.
+RECIPE_RANGE_FILTERS = (
+    ('min_time', 'time_minutes__gte', serializers.IntegerField(min_value=0)),
+    ('max_time', 'time_minutes__lte', serializers.IntegerField(min_value=0)),
+    ('max_price', 'price__lte', serializers.DecimalField(
+        max_digits=None,
+        decimal_places=None,
+        min_value=0
+    )),
+)
+
+# Fields the recipes can be ordered by with the ordering parameter.
+RECIPE_ORDERING_FIELDS = ('id', 'time_minutes', 'price')
+
+
+def filter_ranges(queryset, params, filters=RECIPE_RANGE_FILTERS):
+    # Apply the range filters given in the query params
+    for param, lookup, field in filters:
+        value = params.get(param)
+        if not value:
+            continue
+        try:
+            value = field.run_validation(value)
+        except ValidationError as error:
+            raise ValidationError({param: error.detail})
+        queryset = queryset.filter(**{lookup: value})
+
+    return queryset
+
+
+def parse_ordering(value, fields=RECIPE_ORDERING_FIELDS):
+    # Turn an ordering parameter (a field, - for descending) into an
+    # order_by() tuple. The newest recipes come first among equal values.
+    if value.lstrip('-') not in fields:
+        choices = ', '.join(f'"{field}"' for field in fields)
+        raise ValidationError({'ordering': [
+            f'Expected one of {choices}, optionally prefixed with "-".'
+        ]})
+    if value.lstrip('-') == 'id':
+        return (value,)
+
+    return (value, '-id')
+
+
+def filter_by_related_ids(queryset, field_name, ids, match=MATCH_ANY):
+    # Filter a queryset down to the objects linked through the many to many
+    # field_name to any (or all) of the given ids.
+    '''
+    Note
+    Filtering with tags__id__in joins the through table, which returns an
+    object once per matching row. Instead we only look at the through table
+    in a subquery: an EXISTS for 'any', and for 'all' the ids of the objects
+    that have a row for every one of the ids (GROUP BY ... HAVING COUNT).
+    Each object is returned at most once either way.
+    '''
+    field = queryset.model._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = field.m2m_column_name()
+    target = field.m2m_reverse_name()
+    ids = set(ids)
+
+    if match == MATCH_ANY:
+        links = through.objects.filter(**{
+            source: OuterRef('pk'),
+            f'{target}__in': ids,
+        })
+        # Django 2.1 can only filter on an Exists() once it's annotated.
+        annotation = f'_has_{field_name}'
+        return queryset.annotate(**{annotation: Exists(links)}).filter(
+            **{annotation: True}
+        )
+
+    if match == MATCH_ALL:
+        matching = through.objects.filter(**{f'{target}__in': ids}).values(
+            source
+        ).annotate(
+            matches=Count(target, distinct=True)
+        ).filter(matches=len(ids)).values(source)
+        return queryset.filter(pk__in=matching)
+
+    raise ValidationError({
+        f'{field_name}_match': [f'Expected "{MATCH_ANY}" or "{MATCH_ALL}".']
+    })
+
+
+def recipes_field(queryset):
+    # The Recipe many to many field of a tag or ingredient queryset
+    return next(
+        field for field in Recipe._meta.many_to_many
+        if field.related_model is queryset.model
+    )
+
+
+def filter_assigned(queryset):
+    # Filter tags/ingredients down to the ones assigned to any recipe.
+    '''
+    Note
+    Filtering on recipe__isnull=False joins every recipe the object is
+    assigned to, which then needs a DISTINCT to remove the copies. A
+    correlated EXISTS stops at the first through table row it finds (using
+    the (tag_id, recipe_id) index) and never returns duplicates.
+    '''
+    field = recipes_field(queryset)
+    links = field.remote_field.through.objects.filter(**{
+        field.m2m_reverse_name(): OuterRef('pk'),
+    })
+
+    return queryset.annotate(_assigned=Exists(links)).filter(_assigned=True)
+
+
+# Whether pg_trgm is installed, by database alias. Checked once per process.
+_trigram_installed = {}
+
+
+def trigram_installed():
+    # pg_trgm is optional, migration 0011 only installs it when the server
+    # has it available.
+    if connection.vendor != 'postgresql':
+        return False
+    if connection.alias not in _trigram_installed:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+            )
+            installed = cursor.fetchone() is not None
+        _trigram_installed[connection.alias] = installed
+
+    return _trigram_installed[connection.alias]
+
+
+def filter_typeahead(queryset, text, prefix=False):
+    # Filter tags/ingredients down to the names containing text (or starting
+    # with it when prefix is set), best matches first.
+    '''
+    Note
+    With pg_trgm the LIKE is answered from the trigram GIN index on name,
+    names within the similarity threshold of text match too (typos), and
+    the matches are ranked by trigram similarity. Without it prefix matches
+    rank first. Ties go to the names used by more recipes, counted from the
+    (tag_id, recipe_id) through table indexes for the matches only.
+    '''
+    lookup = 'name__istartswith' if prefix else 'name__icontains'
+    condition = Q(**{lookup: text})
+    if trigram_installed():
+        # Django compares UPPER(name) for case insensitive lookups, which is
+        # what the trigram index is built on (see migration 0011).
+        queryset = queryset.annotate(_name_upper=Upper('name'))
+        if not prefix:
+            condition |= Q(_name_upper__trigram_similar=text.upper())
+        similarity = TrigramSimilarity('name', text)
+    else:
+        similarity = Case(
+            When(name__istartswith=text, then=Value(1.0)),
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+
+    field = recipes_field(queryset)
+    target = field.m2m_reverse_name()
+    usage = field.remote_field.through.objects.filter(**{
+        target: OuterRef('pk')
+    }).order_by().values(target).annotate(count=Count('*')).values('count')
+
+    return queryset.filter(condition).annotate(
+        similarity=similarity,
+        usage=Coalesce(Subquery(usage, output_field=IntegerField()), 0)
+    ).order_by('-similarity', '-usage', 'name', 'id')
@@ -0,0 +1,46 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    # Keyset (cursor) pagination for the recipe API.
+    # Django REST Framework CursorPagination doc -
+    # https://www.django-rest-framework.org/api-guide/pagination/#cursorpagination
+    '''
+    Note
+    Instead of OFFSET, each page is fetched with a WHERE on the ordering
+    column starting from the position stored in the opaque cursor, so a
+    deep page costs the same as the first one. Pagination is only switched
+    on when the client sends a cursor or a page_size, existing clients that
+    expect a plain list of results keep getting one.
+    '''
+    page_size = 100
+    page_size_query_param = 'page_size'
+    # Clients can't ask for more than this many results per page.
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if (self.cursor_query_param not in params and
+                self.page_size_query_param not in params):
+            return None
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        # Views can set pagination_ordering to page through the results in
+        # another order for a request, e.g. by search rank.
+        ordering = getattr(view, 'pagination_ordering', None)
+        if ordering:
+            return ordering
+
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeAttrCursorPagination(OptionalCursorPagination):
+    # Pagination for tags and ingredients, id breaks ties between names.
+    ordering = ('-name', 'id')
+
+
+class RecipeCursorPagination(OptionalCursorPagination):
+    # Pagination for recipes, newest first.
+    ordering = ('-id',)
@@ -0,0 +1,110 @@
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+                                           SearchVector
+from django.db import connection
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, \
+                             TextField, Value
+from django.db.models.functions import Cast
+
+from core.models import Recipe
+
+
+# The 'simple' configuration lowercases words without stemming them or
+# dropping stop words, so a partly typed word (e.g. "on" for "onion") is
+# never thrown away before it's matched as a prefix.
+SEARCH_CONFIG = 'simple'
+
+
+def _related_names(field_name):
+    # Subquery joining the names of a recipe's tags or ingredients
+    field = Recipe._meta.get_field(field_name)
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    names = field.remote_field.through.objects.filter(**{
+        source: OuterRef('pk')
+    }).values(source).annotate(
+        names=StringAgg(f'{target}__name', ' ')
+    ).values('names')
+
+    return Subquery(names, output_field=TextField())
+
+
+def search_vector():
+    # The search document of a recipe, matches in the title rank higher
+    # than matches in its tags and ingredients.
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector(
+            _related_names('tags'),
+            weight='B',
+            config=SEARCH_CONFIG
+        ) +
+        SearchVector(
+            _related_names('ingredients'),
+            weight='B',
+            config=SEARCH_CONFIG
+        )
+    )
+
+
+def update_search_vectors(recipe_ids):
+    # Recompute the stored search_vector of the given recipes (ids or a
+    # values('pk') queryset) in one UPDATE. Only PostgreSQL has full-text
+    # search.
+    if connection.vendor != 'postgresql':
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        search_vector=search_vector()
+    )
+
+
+class PrefixSearchQuery(SearchQuery):
+    # SearchQuery matching each of its words as a prefix. Django 2.1's
+    # SearchQuery only supports plainto_tsquery(), which can't do that.
+
+    def __init__(self, terms, **kwargs):
+        super().__init__(
+            ' & '.join(f'{term}:*' for term in terms),
+            **kwargs
+        )
+
+    def as_sql(self, compiler, connection):
+        sql, params = super().as_sql(compiler, connection)
+        return sql.replace('plainto_tsquery(', 'to_tsquery(', 1), params
+
+
+def search_terms(text):
+    # Split a search string into words. Anything else is dropped, it has a
+    # meaning in the tsquery syntax.
+    return re.findall(r'\w+', text)
+
+
+def search_recipes(queryset, terms):
+    # Filter recipes down to the ones matching all of the terms (as
+    # prefixes), annotated with their search_rank.
+    '''
+    Note
+    The query is answered from the GIN index on the stored search_vector,
+    without reading the tags and ingredients. Other databases get a plain
+    title__icontains filter instead, ranked equally.
+    '''
+    if connection.vendor != 'postgresql':
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term)
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    query = PrefixSearchQuery(terms, config=SEARCH_CONFIG)
+    # ts_rank() returns a real, which doesn't survive the round trip to a
+    # Python float and back in the cursor pagination's position. A double
+    # does.
+    return queryset.annotate(
+        search_rank=Cast(
+            SearchRank(F('search_vector'), query),
+            FloatField()
+        )
+    ).filter(search_vector=query)
@@ -1,44 +1,399 @@
+from collections import OrderedDict
+from operator import attrgetter
+
+from django.core.validators import FileExtensionValidator
+from django.db import connection, transaction
+
 from rest_framework import serializers
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from core.models import Tag, Ingredient, Recipe, RecipeImageVariant, \
+                        touch_updated_at
+
+from recipe.fields import BatchedManyRelatedField, UserPrimaryKeyRelatedField
+from recipe.search import update_search_vectors
+
+
+def cache_related(obj, field_name, items):
+    # Store items as the prefetched field_name objects of obj, the way
+    # prefetch_related() does, so rendering obj doesn't query them again.
+    # They're ordered by id like in RecipeQuerySet's prefetches.
+    if not hasattr(obj, '_prefetched_objects_cache'):
+        obj._prefetched_objects_cache = {}
+    obj._prefetched_objects_cache.pop(field_name, None)
+    queryset = getattr(obj, field_name).all()
+    queryset._result_cache = sorted(set(items), key=attrgetter('pk'))
+    queryset._prefetch_done = True
+    obj._prefetched_objects_cache[field_name] = queryset
+
+
+def image_srcset(variants, request=None):
+    # Map each image format to a srcset string of its (format, width, file
+    # name) variants, e.g.
+    # {'webp': '/media/a_128.webp 128w, /media/a_512.webp 512w'}
+    storage = RecipeImageVariant._meta.get_field('image').storage
+    candidates = {}
+    for fmt, width, name in variants:
+        url = storage.url(name)
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        candidates.setdefault(fmt, []).append((width, url))
+
+    return {
+        fmt: ', '.join(f'{url} {width}w' for width, url in sorted(items))
+        for fmt, items in candidates.items()
+    }
+
+
+def find_taken(model, user, field, items):
+    # Return the values of the (pk, value) items that another of the user's
+    # objects already has for field, checking them all with one query. pk
+    # is the object the value is for, None for new objects.
+    values = {value for _, value in items}
+    existing = dict(
+        model.objects.filter(user=user, **{f'{field}__in': values})
+        .values_list(field, 'pk')
+    )
+
+    return [
+        value for pk, value in items
+        if value in existing and existing[value] != pk
+    ]
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    # List serializer that writes a whole batch of objects at once.
+    # Django REST Framework ListSerializer doc -
+    # https://www.django-rest-framework.org/api-guide/serializers/#listserializer
+    '''
+    Note
+    Rows are inserted with a single bulk_create and the many to many links
+    are inserted straight into the auto-created through tables with one
+    bulk_create per field. Everything runs in one transaction, so either
+    the whole batch is saved or none of it is.
+    '''
+
+    def _batched_fields(self):
+        return [
+            field for field in self.child.fields.values()
+            if isinstance(field, BatchedManyRelatedField)
+        ]
+
+    def to_internal_value(self, data):
+        # Look up the related ids of the whole batch with one query per
+        # field before the items are validated one at a time.
+        if isinstance(data, list):
+            for field in self._batched_fields():
+                field.prefetch([
+                    item.get(field.field_name)
+                    for item in data if isinstance(item, dict)
+                ])
+        try:
+            return super().to_internal_value(data)
+        finally:
+            for field in self._batched_fields():
+                field.clear_prefetched()
+
+    def validate(self, attrs):
+        # Catch duplicates inside the batch, which the child serializers
+        # validating one item at a time can't see, and the ones with the
+        # user's other objects with one query per field.
+        instances = self.instance
+        if not isinstance(instances, list):
+            instances = [None] * len(attrs)
+        request = self.context.get('request')
+        for field in getattr(self.child, 'unique_per_user_fields', ()):
+            items = [
+                (getattr(instance, 'pk', None), item[field])
+                for instance, item in zip(instances, attrs)
+                if item.get(field) is not None
+            ]
+            seen = set()
+            for _, value in items:
+                if value in seen:
+                    raise serializers.ValidationError(
+                        f'"{value}" appears more than once in the batch.'
+                    )
+                seen.add(value)
+            if request is None or not items:
+                continue
+            taken = find_taken(self.child.Meta.model, request.user, field,
+                               items)
+            if taken:
+                raise serializers.ValidationError(
+                    f'You already have one named "{taken[0]}".'
+                )
+
+        return attrs
+
+    def _pop_relations(self, validated_data):
+        # Split the many to many values off of each item
+        names = [
+            field.name for field in self.child.Meta.model._meta.many_to_many
+        ]
+        return [
+            {name: attrs.pop(name) for name in names if name in attrs}
+            for attrs in validated_data
+        ]
+
+    def _set_relations(self, objs, relations, replace):
+        # Insert the through table rows for all objects in one query
+        # per field, deleting the old links first when replacing them.
+        model = self.child.Meta.model
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            source = field.m2m_column_name()
+            target = field.m2m_reverse_name()
+            changed = [
+                (obj, related[field.name])
+                for obj, related in zip(objs, relations)
+                if field.name in related
+            ]
+            if not changed:
+                continue
+            if replace:
+                through.objects.filter(**{
+                    f'{source}__in': [obj.pk for obj, _ in changed]
+                }).delete()
+                # Count the new links as a change of the objects, like the
+                # m2m_changed handler in recipe.signals does.
+                touch_updated_at(model, [obj.pk for obj, _ in changed])
+            through.objects.bulk_create([
+                through(**{source: obj.pk, target: item.pk})
+                for obj, items in changed
+                for item in set(items)
+            ])
+            # Reuse the validated objects so the response doesn't need to
+            # load the new links again.
+            for obj, items in changed:
+                cache_related(obj, field.name, items)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        relations = self._pop_relations(validated_data)
+        objs = [model(**attrs) for attrs in validated_data]
+
+        with transaction.atomic():
+            # Only some databases (e.g. PostgreSQL) hand back the new ids
+            # from a bulk insert, and we need them for the responses and
+            # the many to many links.
+            if connection.features.can_return_ids_from_bulk_insert:
+                objs = model.objects.bulk_create(objs)
+            else:
+                for obj in objs:
+                    obj.save()
+            self._set_relations(objs, relations, replace=False)
+
+        return objs
+
+    def update(self, instances, validated_data):
+        # instances and validated_data are in the same order, the view
+        # matches them up by id.
+        relations = self._pop_relations(validated_data)
+
+        # auto_now fields (updated_at) are only saved when listed.
+        auto_now = [
+            field.name
+            for field in self.child.Meta.model._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+        ]
+
+        with transaction.atomic():
+            for obj, attrs in zip(instances, validated_data):
+                for attr, value in attrs.items():
+                    setattr(obj, attr, value)
+                if attrs:
+                    obj.save(update_fields=list(attrs) + auto_now)
+            self._set_relations(instances, relations, replace=True)
 
-from core.models import Tag, Ingredient, Recipe
+        return instances
 
 
-class TagSerializer(serializers.ModelSerializer):
+class RecipeBulkListSerializer(BulkListSerializer):
+    # Bulk writes of recipes don't send the signals that keep the search
+    # documents up to date, so the whole batch is updated here.
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            recipes = super().create(validated_data)
+            update_search_vectors([recipe.pk for recipe in recipes])
+        return recipes
+
+    def update(self, instances, validated_data):
+        with transaction.atomic():
+            recipes = super().update(instances, validated_data)
+            update_search_vectors([recipe.pk for recipe in recipes])
+        return recipes
+
+
+class RecipeAttrSerializer(serializers.ModelSerializer):
+    # Base serializer for user owned recipe attributes, whose names are
+    # unique per user.
+    unique_per_user_fields = ('name',)
+
+    def validate_name(self, value):
+        # The user isn't one of the serializer fields, so the unique
+        # together validator isn't added for us. The items of a batch are
+        # checked all at once by BulkListSerializer.validate instead.
+        request = self.context.get('request')
+        if request is None or isinstance(self.parent, BulkListSerializer):
+            return value
+        pk = getattr(self.instance, 'pk', None)
+        if find_taken(self.Meta.model, request.user, 'name', [(pk, value)]):
+            raise serializers.ValidationError(
+                f'You already have one named "{value}".'
+            )
+
+        return value
+
+
+class TagSerializer(RecipeAttrSerializer):
     # Serializer for Tag objects
 
     class Meta:
         model = Tag
         fields = ('id', 'name')
         read_only_fields = ('id',)
+        list_serializer_class = BulkListSerializer
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(RecipeAttrSerializer):
     # Serializer for Ingredient objects
 
     class Meta:
         model = Ingredient
         fields = ('id', 'name')
         read_only_fields = ('id',)
+        list_serializer_class = BulkListSerializer
 
 
 class RecipeSerializer(serializers.ModelSerializer):
     # Serialize a recipe
     # Django REST Framework PrimaryKeyRelatedField doc -
     # https://www.django-rest-framework.org/api-guide/relations/#primarykeyrelatedfield
-    ingredients = serializers.PrimaryKeyRelatedField(
+    # Only the request user's tags and ingredients are accepted, and all of
+    # the ids of a field are checked with one query (see recipe.fields).
+    ingredients = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Ingredient.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes',
-                  'price', 'link')
-        read_only_fields = ('id',)
+                  'price', 'link', 'image_status', 'image_srcset')
+        read_only_fields = ('id', 'image_status')
+        list_serializer_class = RecipeBulkListSerializer
+
+    def _related_data(self, validated_data):
+        return {
+            field.name: validated_data[field.name]
+            for field in Recipe._meta.many_to_many
+            if field.name in validated_data
+        }
+
+    def create(self, validated_data):
+        related = self._related_data(validated_data)
+        recipe = super().create(validated_data)
+        # The tags and ingredients were fetched while validating them.
+        for name, items in related.items():
+            cache_related(recipe, name, items)
+        return recipe
+
+    def update(self, instance, validated_data):
+        related = self._related_data(validated_data)
+        recipe = super().update(instance, validated_data)
+        for name, items in related.items():
+            cache_related(recipe, name, items)
+        return recipe
+
+    def get_image_srcset(self, recipe):
+        return image_srcset(
+            ((variant.format, variant.width, variant.image.name)
+             for variant in recipe.image_variants.all()),
+            self.context.get('request')
+        )
+
+
+class RecipeValuesSerializer:
+    # Read-only stand-in for RecipeSerializer(many=True), rendering the
+    # recipe list from .values() rows instead of model instances.
+    '''
+    Note
+    RecipeSerializer runs every field's to_representation for every row,
+    which dominates the time spent on large lists. Here the rows come from
+    Recipe.objects.values(*RecipeValuesSerializer.fields) and the tag and
+    ingredient ids and image variants of the whole page are fetched with
+    one values_list() query each. The output has to stay identical to
+    RecipeSerializer's, which recipe/tests/test_recipe_values.py checks.
+    '''
+    fields = ('id', 'title', 'time_minutes', 'price', 'link', 'image_status')
+
+    def __init__(self, instance, many=True, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    def _related_ids(self, field_name, recipe_ids):
+        # Map each recipe id to the ids of its field_name objects, in the
+        # same (id) order as RecipeQuerySet.with_related_ids()
+        field = Recipe._meta.get_field(field_name)
+        source = field.m2m_column_name()
+        target = field.m2m_reverse_name()
+        links = field.remote_field.through.objects.filter(**{
+            f'{source}__in': recipe_ids
+        }).order_by(target).values_list(source, target)
+
+        related = {recipe_id: [] for recipe_id in recipe_ids}
+        for recipe_id, related_id in links:
+            related[recipe_id].append(related_id)
+        return related
+
+    def _variants(self, recipe_ids):
+        # Map each recipe id to the (format, width, file name) of its
+        # image variants
+        variants = {recipe_id: [] for recipe_id in recipe_ids}
+        rows = RecipeImageVariant.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('id').values_list('recipe_id', 'format', 'width', 'image')
+        for recipe_id, fmt, width, name in rows:
+            variants[recipe_id].append((fmt, width, name))
+        return variants
+
+    @property
+    def data(self):
+        rows = list(self.instance)
+        recipe_ids = [row['id'] for row in rows]
+        if recipe_ids:
+            ingredients = self._related_ids('ingredients', recipe_ids)
+            tags = self._related_ids('tags', recipe_ids)
+            variants = self._variants(recipe_ids)
+        request = self.context.get('request')
+        # The same field RecipeSerializer renders the price with, so the
+        # decimal places and COERCE_DECIMAL_TO_STRING are applied the same.
+        price = RecipeSerializer().fields['price'].to_representation
+
+        # The key order has to follow RecipeSerializer.Meta.fields.
+        data = [
+            OrderedDict((
+                ('id', row['id']),
+                ('title', row['title']),
+                ('ingredients', ingredients[row['id']]),
+                ('tags', tags[row['id']]),
+                ('time_minutes', row['time_minutes']),
+                ('price', price(row['price'])),
+                ('link', row['link']),
+                ('image_status', row['image_status']),
+                ('image_srcset', image_srcset(variants[row['id']], request)),
+            ))
+            for row in rows
+        ]
+        return ReturnList(data, serializer=self)
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -53,9 +408,20 @@ class RecipeDetailSerializer(RecipeSerializer):
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
-    # Serializer for uploading images to recipes
+    # Serializer for a recipe's image and its processing status
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_status')
+        read_only_fields = ('id', 'image', 'image_status')
+
+
+class RecipeImageUploadSerializer(serializers.Serializer):
+    # Serializer for uploading images to recipes
+    # The file is only checked by its extension here, decoding it with
+    # Pillow is left to the background worker (see core.images).
+    image = serializers.FileField(
+        validators=[FileExtensionValidator(
+            ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp']
+        )]
+    )
@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+                                      pre_delete
+from django.dispatch import receiver
+
+from core.models import Ingredient, Recipe, Tag, touch_updated_at
+
+from recipe.cache import bump_version
+from recipe.search import update_search_vectors
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_user_cache(sender, instance, **kwargs):
+    # Any change to a user's recipes, tags or ingredients invalidates the
+    # user's cached responses
+    bump_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_user_cache_on_links(sender, instance, action, reverse,
+                                   pk_set, **kwargs):
+    # instance is the recipe, or the tag/ingredient when the relation was
+    # changed from that side, both belong to the same user
+    if reverse and action == 'pre_clear':
+        # The recipes losing the link can't be found after the clear.
+        pk_set = set(
+            sender.objects.filter(**{
+                f'{instance._meta.model_name}_id': instance.pk
+            }).values_list('recipe_id', flat=True)
+        )
+        instance._cleared_recipe_ids = pk_set
+    if not action.startswith('post_'):
+        return
+
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = getattr(instance, '_cleared_recipe_ids', ())
+    else:
+        recipe_ids = pk_set or ()
+    # Changing the links counts as a change of the recipes for their
+    # updated_at, which the conditional request ETags are based on, and
+    # changes their search documents.
+    touch_updated_at(Recipe, recipe_ids)
+    update_search_vectors(recipe_ids)
+    bump_version(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, created, update_fields,
+                                **kwargs):
+    # Only the title of the recipe itself is part of its search document
+    if created or update_fields is None or 'title' in update_fields:
+        update_search_vectors([instance.pk])
+
+
+def _linked_recipes(instance):
+    # The recipes a tag or ingredient is assigned to
+    field_name = 'tags' if isinstance(instance, Tag) else 'ingredients'
+    return Recipe.objects.filter(**{field_name: instance})
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_linked_search_vectors(sender, instance, created, update_fields,
+                                 **kwargs):
+    # Renaming a tag or ingredient changes the documents of its recipes
+    if created or (update_fields is not None and 'name' not in update_fields):
+        return
+    update_search_vectors(_linked_recipes(instance).values('pk'))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_linked_recipes(sender, instance, **kwargs):
+    # The links are deleted along with the tag or ingredient, without an
+    # m2m_changed signal, so the recipes are looked up beforehand.
+    instance._linked_recipe_ids = list(
+        _linked_recipes(instance).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_unlinked_search_vectors(sender, instance, **kwargs):
+    update_search_vectors(getattr(instance, '_linked_recipe_ids', ()))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def start_new_user_cache(sender, instance, created, **kwargs):
+    # A new user never sees responses cached for an earlier user that had
+    # the same id (e.g. when a test database reuses ids)
+    if created:
+        bump_version(instance.pk)
@@ -7,6 +7,7 @@ from rest_framework.test import APIClient
 
 from core.models import Ingredient, Recipe
 
+from recipe.filters import trigram_installed
 from recipe.serializers import IngredientSerializer
 
 
@@ -131,3 +132,101 @@ class PrivateIngredientsApiTests(TestCase):
         res = self.client.get(INGREDIENTS_URL, {'assigned_only':1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_retrieve_ingredients_not_modified(self):
+        # Test a repeated request with the ETag gets 304 Not Modified
+        Ingredient.objects.create(user=self.user, name='Salt')
+        etag = self.client.get(INGREDIENTS_URL)['ETag']
+        res = self.client.get(INGREDIENTS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Ingredient.objects.create(user=self.user, name='Pepper')
+        res = self.client.get(INGREDIENTS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+
+class IngredientTypeaheadApiTests(TestCase):
+    # Test the q/prefix typeahead parameters of the ingredients API
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def sample_ingredients(self, *names):
+        return [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in names
+        ]
+
+    def names(self, **params):
+        res = self.client.get(INGREDIENTS_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [ingredient['name'] for ingredient in res.data]
+
+    def test_q_matches_names_containing_text(self):
+        # Test q returns the names containing the text, prefix matches first
+        self.sample_ingredients('Sea Salt', 'Salt', 'Pepper')
+        user2 = get_user_model().objects.create_user('other@test.com', 'pass')
+        Ingredient.objects.create(user=user2, name='Salted Butter')
+
+        self.assertEqual(self.names(q='salt'), ['Salt', 'Sea Salt'])
+
+    def test_prefix_matches_names_starting_with_text(self):
+        # Test prefix only returns the names starting with the text
+        self.sample_ingredients('Sea Salt', 'Salt', 'Salami')
+
+        self.assertEqual(
+            sorted(self.names(prefix='sal')),
+            ['Salami', 'Salt']
+        )
+
+    def test_ties_ranked_by_usage(self):
+        # Test equally good matches used by more recipes come first
+        flour_a, flour_b = self.sample_ingredients('Flour A', 'Flour B')
+        for n in range(2):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Bread {n}',
+                time_minutes=60,
+                price=2
+            )
+            recipe.ingredients.add(flour_b)
+
+        self.assertEqual(self.names(q='flour'), ['Flour B', 'Flour A'])
+
+    def test_limit(self):
+        # Test only the top results are returned
+        self.sample_ingredients(*[f'Cheese {n:02}' for n in range(15)])
+
+        self.assertEqual(len(self.names(q='cheese')), 10)
+        self.assertEqual(len(self.names(q='cheese', limit=3)), 3)
+        for limit in ('0', '51', 'abc'):
+            res = self.client.get(INGREDIENTS_URL, {'q': 'ch', 'limit': limit})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_typeahead_not_modified(self):
+        # Test typeahead responses support conditional requests
+        self.sample_ingredients('Salt')
+        etag = self.client.get(INGREDIENTS_URL, {'q': 'sa'})['ETag']
+        res = self.client.get(
+            INGREDIENTS_URL,
+            {'q': 'sa'},
+            HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_q_tolerates_typos(self):
+        # Test names similar to the text match with pg_trgm
+        if not trigram_installed():
+            self.skipTest('pg_trgm is not installed')
+        self.sample_ingredients('Mozzarella', 'Parmesan')
+
+        self.assertEqual(self.names(q='mozarella'), ['Mozzarella'])
@@ -0,0 +1,188 @@
+import json
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient
+from core.seeding import seed_database
+
+from recipe.filters import trigram_installed
+
+
+def _seq_scans(plan):
+    # Return the tables read with a sequential scan in an EXPLAIN plan
+    tables = []
+    if plan.get('Node Type') == 'Seq Scan':
+        tables.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        tables.extend(_seq_scans(child))
+
+    return tables
+
+
+def _index_names(plan):
+    # Return the indexes an EXPLAIN plan reads
+    names = []
+    if 'Index Name' in plan:
+        names.append(plan['Index Name'])
+    for child in plan.get('Plans', []):
+        names.extend(_index_names(child))
+
+    return names
+
+
+def _unique_index(model, fields):
+    # Name of the index Django created for a unique_together of the model
+    columns = [model._meta.get_field(field).column for field in fields]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, model._meta.db_table
+        )
+    return next(
+        name for name, info in constraints.items()
+        if info['unique'] and info['columns'] == columns
+    )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN plans need Postgres')
+class QueryPlanTests(TestCase):
+    # Test that the list endpoints can be answered from the indexes.
+    '''
+    Note
+    On a small table a sequential scan is often the cheapest plan, so we
+    turn sequential scans off. PostgreSQL then still uses one only when
+    there is no index that can answer the query at all. That alone would
+    pass with any index, so the paginated lists also check that a page is
+    read in order from the composite index matching its ordering.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        # Enough rows per user that reading the composite indexes beats
+        # reading a user's rows through the user_id foreign key index and
+        # sorting them.
+        user_ids = seed_database(users=10, tags=200, ingredients=200,
+                                 recipes=2000)
+        cls.users = list(get_user_model().objects.filter(pk__in=user_ids))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def assertNoSeqScans(self, url, params=None, indexes=()):
+        # Also checks that the queries read the given indexes, since with
+        # sequential scans turned off any index at all would pass.
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, params)
+
+        used = []
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for query in ctx.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + query['sql'])
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                self.assertEqual(
+                    _seq_scans(plan[0]['Plan']), [],
+                    f'Sequential scan for: {query["sql"]}'
+                )
+                used.extend(_index_names(plan[0]['Plan']))
+        for index in indexes:
+            self.assertIn(index, used)
+
+    def test_tags_list_uses_indexes(self):
+        self.assertNoSeqScans(reverse('recipe:tag-list'))
+
+    def test_tags_page_uses_unique_index(self):
+        # A page is read in name order from the (user, name) index instead
+        # of sorting all the user's tags.
+        self.assertNoSeqScans(
+            reverse('recipe:tag-list'),
+            {'page_size': 20},
+            indexes=[_unique_index(Tag, ('user', 'name'))]
+        )
+
+    def test_assigned_tags_list_uses_indexes(self):
+        self.assertNoSeqScans(
+            reverse('recipe:tag-list'),
+            {'assigned_only': 1}
+        )
+
+    def test_ingredients_list_uses_indexes(self):
+        self.assertNoSeqScans(reverse('recipe:ingredient-list'))
+
+    def test_ingredients_page_uses_unique_index(self):
+        self.assertNoSeqScans(
+            reverse('recipe:ingredient-list'),
+            {'page_size': 20},
+            indexes=[_unique_index(Ingredient, ('user', 'name'))]
+        )
+
+    def test_recipes_list_uses_indexes(self):
+        self.assertNoSeqScans(reverse('recipe:recipe-list'))
+
+    def test_recipes_page_uses_user_id_index(self):
+        self.assertNoSeqScans(
+            reverse('recipe:recipe-list'),
+            {'page_size': 20},
+            indexes=['recipe_user_id_idx']
+        )
+
+    def test_recipes_page_by_price_uses_user_price_index(self):
+        self.assertNoSeqScans(
+            reverse('recipe:recipe-list'),
+            {'page_size': 20, 'ordering': 'price'},
+            indexes=['recipe_user_price_idx']
+        )
+
+    def test_recipes_page_by_time_uses_user_time_index(self):
+        self.assertNoSeqScans(
+            reverse('recipe:recipe-list'),
+            {'page_size': 20, 'ordering': 'time_minutes'},
+            indexes=['recipe_user_time_idx']
+        )
+
+    def test_recipes_filtered_list_uses_indexes(self):
+        tag_ids = Tag.objects.filter(user=self.users[0]).values_list(
+            'id', flat=True
+        )[:2]
+        self.assertNoSeqScans(
+            reverse('recipe:recipe-list'),
+            {'tags': ','.join(str(pk) for pk in tag_ids)}
+        )
+
+    def test_recipes_search_uses_indexes(self):
+        self.assertNoSeqScans(
+            reverse('recipe:recipe-list'),
+            {'search': 'recipe 1'}
+        )
+
+    def test_recipes_range_filtered_list_uses_indexes(self):
+        self.assertNoSeqScans(
+            reverse('recipe:recipe-list'),
+            {'max_time': 10, 'max_price': 20, 'ordering': 'price'}
+        )
+
+    def test_ingredients_typeahead_uses_trigram_index(self):
+        # Test ?q= finds the names containing (or similar to) the text from
+        # the trigram index rather than checking each of the user's names
+        if not trigram_installed():
+            self.skipTest('pg_trgm is not installed')
+        Ingredient.objects.create(user=self.users[0], name='Mozzarella')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_ingredient')
+
+        self.assertNoSeqScans(
+            reverse('recipe:ingredient-list'),
+            {'q': 'mozzarella'},
+            indexes=['ingredient_name_trgm_idx']
+        )
@@ -1,22 +1,37 @@
 import tempfile
 import os
+import runpy
+import shutil
+from datetime import timedelta
+from unittest.mock import patch
 
 # PIL is the Pillow library.
 from PIL import Image
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Recipe, Tag, Ingredient
+from core.images import claim_jobs, run_jobs
+from core.models import Recipe, Tag, Ingredient, ImageJob, \
+                        RecipeImageVariant
 
+from recipe.cache import get_version
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.tests.utils import QueryCountMixin
 
 
 RECIPES_URL = reverse('recipe:recipe-list')
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
 # /api/recipe/recipes  What the RECIPES_URL might look like
 
 
@@ -69,7 +84,7 @@ class PublicRecipeApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateRecipeApiTests(TestCase):
+class PrivateRecipeApiTests(QueryCountMixin, TestCase):
     # Test unauthenticated recipe API access
 
     def setUp(self):
@@ -123,6 +138,58 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeDetailSerializer(recipe)
         self.assertEqual(res.data, serializer.data)
 
+    def _add_recipes_with_relations(self, count):
+        # Create recipes that each have their own tag and ingredient
+        for _ in range(count):
+            recipe = sample_recipe(user=self.user)
+            name = f'Item {Recipe.objects.count()}'
+            recipe.tags.add(sample_tag(user=self.user, name=name))
+            recipe.ingredients.add(
+                sample_ingredient(user=self.user, name=name)
+            )
+
+    def test_list_recipes_constant_queries(self):
+        # Test listing recipes doesn't run a query per recipe
+        self.assertConstantQueries(
+            self._add_recipes_with_relations,
+            lambda: self.client.get(RECIPES_URL)
+        )
+
+    def test_view_recipe_detail_constant_queries(self):
+        # Test the recipe detail doesn't run a query per tag or ingredient
+        recipe = sample_recipe(user=self.user)
+
+        def add_relations(count):
+            for _ in range(count):
+                name = f'Item {recipe.tags.count()}'
+                recipe.tags.add(sample_tag(user=self.user, name=name))
+                recipe.ingredients.add(
+                    sample_ingredient(user=self.user, name=name)
+                )
+
+        self.assertConstantQueries(
+            add_relations,
+            lambda: self.client.get(detail_url(recipe.id))
+        )
+
+    def test_retrieve_recipes_paginated(self):
+        # Test that a cursor page returns the next recipes by id
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipes[2].id, recipes[1].id]
+        )
+        res = self.client.get(res.data['next'])
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipes[0].id]
+        )
+        self.assertIsNone(res.data['next'])
+
     def test_create_basic_recipe(self):
         # Test creating recipe
         payload = {
@@ -186,6 +253,153 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
+    def test_create_recipe_with_other_users_tag(self):
+        # Test tags of another user can't be assigned to a recipe
+        user2 = get_user_model().objects.create_user(
+            'other@test.com',
+            'testpass'
+        )
+        tag = sample_tag(user=user2)
+        payload = {
+            'title': 'Key Lime Pie',
+            'tags': [tag.id],
+            'time_minutes': 60,
+            'price': 20.00
+        }
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_recipe_reports_missing_ids_together(self):
+        # Test every id that doesn't exist is reported at once
+        tag = sample_tag(user=self.user)
+        payload = {
+            'title': 'Key Lime Pie',
+            'tags': [tag.id, 9998, 9999],
+            'time_minutes': 60,
+            'price': 20.00
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertIn('9998', res.data['tags'][0])
+        self.assertIn('9999', res.data['tags'][1])
+
+    def test_create_recipe_invalid_tag_id(self):
+        # Test ids that aren't numbers are rejected
+        payload = {
+            'title': 'Key Lime Pie',
+            'tags': ['abc'],
+            'time_minutes': 60,
+            'price': 20.00
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+
+    def test_create_recipe_constant_queries(self):
+        # Test the tag ids are validated with one query, however many
+        # there are, and the response doesn't load them again
+        tags = []
+
+        def add_tags(count):
+            for _ in range(count):
+                tags.append(
+                    sample_tag(user=self.user, name=f'Tag {len(tags)}')
+                )
+
+        def create():
+            res = self.client.post(RECIPES_URL, {
+                'title': 'Key Lime Pie',
+                'tags': [tag.id for tag in tags],
+                'ingredients': [],
+                'time_minutes': 60,
+                'price': 20.00
+            }, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(res.data['tags'], [tag.id for tag in tags])
+
+        self.assertConstantQueries(add_tags, create)
+
+    def test_bulk_validation_queries(self):
+        # Test the related ids of a whole batch are looked up with one
+        # query per field
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {
+                'title': f'Recipe {n}',
+                'tags': [tag.id],
+                'ingredients': [ingredient.id],
+                'time_minutes': 10,
+                'price': '3.00'
+            }
+            for n in range(10)
+        ]
+        request = self.client.get(RECIPES_URL).wsgi_request
+        request.user = self.user
+        serializer = RecipeSerializer(
+            data=payload,
+            many=True,
+            context={'request': request}
+        )
+
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data[9]['tags'], [tag])
+
+    def test_bulk_create_recipes(self):
+        # Test creating a batch of recipes with their tags and ingredients
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {
+                'title': 'Pancakes',
+                'tags': [tag.id],
+                'ingredients': [ingredient.id],
+                'time_minutes': 10,
+                'price': '3.00'
+            },
+            {
+                'title': 'Porridge',
+                'tags': [tag.id],
+                'ingredients': [],
+                'time_minutes': 5,
+                'price': '2.00'
+            },
+        ]
+        res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(len(recipes), 2)
+        self.assertEqual(list(recipes[0].tags.all()), [tag])
+        self.assertEqual(list(recipes[0].ingredients.all()), [ingredient])
+        self.assertEqual(list(recipes[1].tags.all()), [tag])
+        self.assertEqual(recipes[1].ingredients.count(), 0)
+        self.assertEqual(res.data[0]['tags'], [tag.id])
+
+    def test_bulk_update_recipes_replaces_tags(self):
+        # Test updating a batch of recipes replaces the given relations
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        recipe1.tags.add(sample_tag(user=self.user))
+        new_tag = sample_tag(user=self.user, name='Curry')
+        payload = [
+            {'id': recipe1.id, 'tags': [new_tag.id]},
+            {'id': recipe2.id, 'title': 'Chicken Tikka'},
+        ]
+        res = self.client.patch(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(recipe1.tags.all()), [new_tag])
+        recipe2.refresh_from_db()
+        self.assertEqual(recipe2.title, 'Chicken Tikka')
+
     def test_partial_update_recipe(self):
         # Test updating a recipe with 'patch'
         # 'patch' - is used to update the fields in a payload. It will only
@@ -228,6 +442,188 @@ class PrivateRecipeApiTests(TestCase):
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
 
+    def test_filter_recipes_by_time_and_price(self):
+        # Test the range filters, also combined with a tag filter
+        quick = sample_recipe(user=self.user, time_minutes=10, price=5.00)
+        cheap = sample_recipe(user=self.user, time_minutes=45, price=8.00)
+        sample_recipe(user=self.user, time_minutes=60, price=25.00)
+        tag = sample_tag(user=self.user)
+        quick.tags.add(tag)
+
+        def ids(params):
+            res = self.client.get(RECIPES_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            return [item['id'] for item in res.data]
+
+        self.assertEqual(ids({'max_time': 30}), [quick.id])
+        self.assertEqual(ids({'min_time': 30, 'max_price': '10'}), [cheap.id])
+        self.assertEqual(ids({'max_price': '8.00'}), [cheap.id, quick.id])
+        self.assertEqual(ids({'max_time': 50, 'tags': f'{tag.id}'}),
+                         [quick.id])
+
+    def test_filter_recipes_invalid_range(self):
+        # Test range values that aren't numbers or are negative are rejected
+        for params in ({'max_time': 'soon'}, {'min_time': -1},
+                       {'max_price': 'cheap'}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(list(params)[0], res.data)
+
+    def test_order_recipes(self):
+        # Test ordering by time or price, newest first among equal values
+        recipe1 = sample_recipe(user=self.user, time_minutes=30, price=9)
+        recipe2 = sample_recipe(user=self.user, time_minutes=10, price=9)
+        recipe3 = sample_recipe(user=self.user, time_minutes=20, price=2)
+
+        res = self.client.get(RECIPES_URL, {'ordering': 'time_minutes'})
+        self.assertEqual(
+            [item['id'] for item in res.data],
+            [recipe2.id, recipe3.id, recipe1.id]
+        )
+        res = self.client.get(RECIPES_URL, {'ordering': '-price'})
+        self.assertEqual(
+            [item['id'] for item in res.data],
+            [recipe2.id, recipe1.id, recipe3.id]
+        )
+
+    def test_order_recipes_paginated(self):
+        # Test cursor pages follow the requested ordering
+        for minutes in (40, 10, 30, 10, 20):
+            sample_recipe(user=self.user, time_minutes=minutes)
+        expected = list(Recipe.objects.order_by(
+            'time_minutes', '-id'
+        ).values_list('id', flat=True))
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'ordering': 'time_minutes', 'page_size': 2}
+        )
+        ids = [item['id'] for item in res.data['results']]
+        for _ in range(len(expected)):
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+            ids.extend(item['id'] for item in res.data['results'])
+
+        self.assertEqual(ids, expected)
+
+    def test_order_recipes_invalid_field(self):
+        # Test only the whitelisted fields can be used for ordering
+        res = self.client.get(RECIPES_URL, {'ordering': 'user__password'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ordering', res.data)
+
+
+class RecipeResponseCacheTests(TestCase):
+    # Test the cached responses of the recipe endpoints
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def test_repeat_list_served_from_cache(self):
+        # Test a repeated list call doesn't query the database
+        self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['id'], self.recipe.id)
+
+    def test_cache_invalidated_by_changes(self):
+        # Test that changing a recipe or its tags updates the response
+        self.client.get(detail_url(self.recipe.id))
+        self.recipe.title = 'Chicken Tikka'
+        self.recipe.save()
+        tag = sample_tag(user=self.user, name='Curry')
+        self.recipe.tags.add(tag)
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data['title'], 'Chicken Tikka')
+        self.assertEqual(res.data['tags'][0]['id'], tag.id)
+
+    def test_cache_separate_per_user(self):
+        # Test one user's cached list isn't served to another user
+        self.client.get(RECIPES_URL)
+        user2 = get_user_model().objects.create_user(
+            'other@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_not_modified_with_etag(self):
+        # Test a request with the current ETag gets a 304
+        res = self.client.get(RECIPES_URL)
+        etag = res['ETag']
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        sample_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 2)
+
+    def test_cache_invalidated_by_other_process(self):
+        # Test a change made by another process (e.g. the image worker)
+        # is seen through the shared cache
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        api_cache = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory,
+        }
+        with override_settings(CACHES=dict(settings.CACHES, api=api_cache)):
+            res = self.client.get(detail_url(self.recipe.id))
+            etag = res['ETag']
+
+            # update() sends no signals, the other process bumps the
+            # version in its own handle on the cache directory.
+            Recipe.objects.filter(pk=self.recipe.pk).update(
+                image_status=Recipe.IMAGE_READY
+            )
+            FileBasedCache(directory, {}).set(
+                f'recipe-api:version:{self.user.pk}',
+                get_version(self.user.pk) + 1,
+                None
+            )
+
+            res_etag = self.client.get(
+                detail_url(self.recipe.id),
+                HTTP_IF_NONE_MATCH=etag
+            )
+            res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res_etag.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
+
+    def test_shared_cache_required_without_debug(self):
+        # Test the settings refuse a per-process cache outside of DEBUG
+        path = os.path.join(settings.BASE_DIR, 'app', 'settings.py')
+        env = {'DJANGO_DEBUG': '0'}
+        with patch.dict(os.environ, env):
+            os.environ.pop('API_CACHE_BACKEND', None)
+            with self.assertRaises(ImproperlyConfigured):
+                runpy.run_path(path)
+
+        env['API_CACHE_BACKEND'] = \
+            'django.core.cache.backends.filebased.FileBasedCache'
+        with patch.dict(os.environ, env):
+            self.assertFalse(runpy.run_path(path)['DEBUG'])
+
 
 class RecipeImageUploadTests(TestCase):
 
@@ -264,12 +660,145 @@ class RecipeImageUploadTests(TestCase):
             # that contains a JSON object.
             res = self.client.post(url, {'image': ntf}, format='multipart')
 
+        # The upload is accepted straight away and processed by the worker.
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+        call_command('process_recipe_images', once=True, workers=1)
+
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
         # check that image is in the response and that the path is saved
         self.assertIn('image', res.data)
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_downscaled(self):
+        # Test that the worker shrinks large images and strips EXIF data
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.png') as ntf:
+            img = Image.new('RGBA', (300, 150))
+            img.save(ntf, format='PNG')
+            ntf.seek(0)
+            self.client.post(url, {'image': ntf}, format='multipart')
+
+        with self.settings(RECIPE_IMAGE_MAX_SIZE=100):
+            call_command('process_recipe_images', once=True, workers=1)
+
+        self.recipe.refresh_from_db()
+        with Image.open(self.recipe.image.path) as processed:
+            self.assertEqual(processed.format, 'JPEG')
+            self.assertEqual(processed.size, (100, 50))
+            self.assertNotIn('exif', processed.info)
+
+    def test_upload_image_renders_variants(self):
+        # Test that the worker renders the responsive variants
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            img = Image.new('RGB', (400, 200))
+            img.save(ntf, format='JPEG')
+            ntf.seek(0)
+            self.client.post(url, {'image': ntf}, format='multipart')
+
+        with self.settings(RECIPE_IMAGE_VARIANT_SIZES=(100, 200)):
+            call_command('process_recipe_images', once=True, workers=1)
+
+        variants = RecipeImageVariant.objects.filter(
+            recipe=self.recipe,
+            format=RecipeImageVariant.JPEG
+        ).order_by('size')
+        self.assertEqual(
+            [(v.width, v.height) for v in variants],
+            [(100, 50), (200, 100)]
+        )
+        for variant in variants:
+            self.assertTrue(os.path.exists(variant.image.path))
+
+        res = self.client.get(detail_url(self.recipe.id))
+        srcset = res.data['image_srcset']['jpeg']
+        self.assertIn(f'{variants[0].image.url} 100w', srcset)
+        self.assertIn(f'{variants[1].image.url} 200w', srcset)
+
+    def test_upload_corrupt_image_fails(self):
+        # Test that a file which isn't really an image is marked as failed
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            ntf.write(b'not an image')
+            ntf.seek(0)
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        call_command('process_recipe_images', once=True, workers=1)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+        job = ImageJob.objects.get(recipe=self.recipe)
+        self.assertEqual(job.status, ImageJob.FAILED)
+        self.assertTrue(job.error)
+
+    def _upload(self):
+        # Upload a small image and return its job
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': ntf},
+                format='multipart'
+            )
+        return ImageJob.objects.get(recipe=self.recipe)
+
+    def test_stuck_image_job_is_claimed_again(self):
+        # Test a job whose worker died while processing it is picked up
+        # by another worker once it timed out
+        job = self._upload()
+        self.assertEqual([j.pk for j in claim_jobs(10)], [job.pk])
+        self.assertEqual(claim_jobs(10), [])
+
+        ImageJob.objects.filter(pk=job.pk).update(
+            claimed_at=timezone.now() - timedelta(hours=1)
+        )
+        call_command('process_recipe_images', once=True, workers=1)
+
+        self.recipe.refresh_from_db()
+        job.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertEqual(job.status, ImageJob.DONE)
+
+    def test_image_job_taken_over(self):
+        # Test a worker doesn't finish a job claimed again by another one,
+        # and removes the files it rendered but keeps the staged upload
+        job = self._upload()
+        images_path = default_storage.path('uploads/recipe')
+        os.makedirs(images_path, exist_ok=True)
+        images = set(os.listdir(images_path))
+        with self.settings(RECIPE_IMAGE_JOB_TIMEOUT=-1):
+            stale = claim_jobs(10)
+            claim_jobs(10)
+
+        self.assertEqual(run_jobs(stale), 0)
+        self.assertEqual(set(os.listdir(images_path)), images)
+        self.assertTrue(os.path.exists(job.staged_image.path))
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_PENDING)
+        self.assertEqual(
+            ImageJob.objects.get(recipe=self.recipe).status,
+            ImageJob.PROCESSING
+        )
+
+    def test_image_job_recipe_deleted(self):
+        # Test the worker carries on when the recipe is deleted while its
+        # image is processed, and removes the files left behind
+        job = self._upload()
+        staged_path = job.staged_image.path
+        images_path = default_storage.path('uploads/recipe')
+        os.makedirs(images_path, exist_ok=True)
+        images = set(os.listdir(images_path))
+        jobs = claim_jobs(10)
+        self.recipe.delete()
+
+        self.assertEqual(run_jobs(jobs), 0)
+        self.assertFalse(os.path.exists(staged_path))
+        self.assertEqual(set(os.listdir(images_path)), images)
+
     def test_upload_image_bad_request(self):
         # Test uploading an invalid image
         url = image_upload_url(self.recipe.id)
@@ -320,3 +849,44 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn(serializer1.data, res.data)
         self.assertIn(serializer2.data, res.data)
         self.assertNotIn(serializer3.data, res.data)
+
+    def test_filter_recipes_by_tags_no_duplicates(self):
+        # Test a recipe matching several tags is only returned once
+        recipe = sample_recipe(user=self.user, title='Thai Veggie Curry')
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Spicy')
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'tags': f'{tag1.id},{tag2.id}'}
+        )
+
+        self.assertEqual([item['id'] for item in res.data], [recipe.id])
+
+    def test_filter_recipes_matching_all_tags(self):
+        # Test tags_match=all only returns recipes with every tag
+        recipe1 = sample_recipe(user=self.user, title='Thai Veggie Curry')
+        recipe2 = sample_recipe(user=self.user, title='Veggie Burger')
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Spicy')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'tags': f'{tag1.id},{tag2.id}', 'tags_match': 'all'}
+        )
+
+        self.assertEqual([item['id'] for item in res.data], [recipe1.id])
+
+    def test_filter_recipes_invalid_match(self):
+        # Test an unknown match mode is rejected
+        tag = sample_tag(user=self.user)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'tags': f'{tag.id}', 'tags_match': 'some'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,143 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Search needs Postgres')
+class RecipeSearchTests(TestCase):
+    # Test the search parameter of the recipes endpoint
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def sample_recipe(self, title, user=None):
+        return Recipe.objects.create(
+            user=user or self.user,
+            title=title,
+            time_minutes=10,
+            price=5
+        )
+
+    def search(self, text, **params):
+        res = self.client.get(RECIPES_URL, {'search': text, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def titles(self, text):
+        return [recipe['title'] for recipe in self.search(text)]
+
+    def test_search_title_prefix(self):
+        # Test words match recipe titles as prefixes
+        self.sample_recipe('Banana Pancakes')
+        self.sample_recipe('Chicken Tikka')
+
+        self.assertEqual(self.titles('panc'), ['Banana Pancakes'])
+        self.assertEqual(self.titles('CHICK tik'), ['Chicken Tikka'])
+        self.assertEqual(self.titles('chicken pancakes'), [])
+
+    def test_search_tags_and_ingredients(self):
+        # Test recipes are found by the names of their tags and ingredients
+        recipe1 = self.sample_recipe('Porridge')
+        recipe1.tags.add(Tag.objects.create(user=self.user, name='Breakfast'))
+        recipe2 = self.sample_recipe('Omelette')
+        recipe2.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Eggs')
+        )
+
+        self.assertEqual(self.titles('breakf'), ['Porridge'])
+        self.assertEqual(self.titles('egg'), ['Omelette'])
+
+    def test_title_matches_rank_first(self):
+        # Test a match in the title ranks above one in the tags
+        tag = Tag.objects.create(user=self.user, name='Curry')
+        self.sample_recipe('Curry Laksa')
+        self.sample_recipe('Rendang').tags.add(tag)
+
+        self.assertEqual(self.titles('curry'), ['Curry Laksa', 'Rendang'])
+
+    def test_search_follows_changes(self):
+        # Test the search documents follow renames and removed links
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = self.sample_recipe('Salad')
+        recipe.tags.add(tag)
+        tag.name = 'Vegetarian'
+        tag.save()
+
+        self.assertEqual(self.titles('vegetarian'), ['Salad'])
+
+        recipe.title = 'Green Salad'
+        recipe.save()
+        self.assertEqual(self.titles('green'), ['Green Salad'])
+
+        tag.delete()
+        self.assertEqual(self.titles('vegetarian'), [])
+
+        ingredient = Ingredient.objects.create(user=self.user, name='Kale')
+        recipe.ingredients.add(ingredient)
+        ingredient.recipe_set.clear()
+        self.assertEqual(self.titles('kale'), [])
+
+    def test_search_bulk_created_recipes(self):
+        # Test recipes created in bulk are searchable
+        tag = Tag.objects.create(user=self.user, name='Dessert')
+        payload = [
+            {'title': 'Brownies', 'tags': [tag.id], 'ingredients': [],
+             'time_minutes': 30, 'price': '4.00'},
+        ]
+        res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.titles('dessert'), ['Brownies'])
+
+    def test_search_limited_to_user(self):
+        # Test other users' recipes are never returned
+        user2 = get_user_model().objects.create_user('other@test.com', 'pass')
+        self.sample_recipe('Pancakes', user=user2)
+
+        self.assertEqual(self.titles('pancakes'), [])
+
+    def test_search_syntax_is_ignored(self):
+        # Test tsquery operators in the search are treated as separators
+        self.sample_recipe('Fish & Chips')
+
+        self.assertEqual(self.titles("fish:* | !('chips"), ['Fish & Chips'])
+        self.assertEqual(self.titles('&&'), ['Fish & Chips'])
+
+    def test_search_paginated_by_rank(self):
+        # Test cursor pages of search results follow the ranking
+        tag = Tag.objects.create(user=self.user, name='Soup')
+        for n in range(3):
+            self.sample_recipe(f'Soup {n}')
+            self.sample_recipe(f'Stew {n}').tags.add(tag)
+        expected = self.titles('soup')
+
+        page = self.search('soup', page_size=2)
+        titles = [recipe['title'] for recipe in page['results']]
+        # Bounded, so a cursor that doesn't advance fails instead of hanging.
+        for _ in range(len(expected)):
+            if not page['next']:
+                break
+            # The next link keeps the search and page_size parameters.
+            page = self.client.get(page['next']).data
+            titles.extend(recipe['title'] for recipe in page['results'])
+
+        self.assertEqual(titles, expected)
+        self.assertEqual(len(titles), 6)
+        self.assertTrue(all(t.startswith('Soup') for t in titles[:3]))
@@ -0,0 +1,156 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import Ingredient, Recipe, RecipeImageVariant, Tag
+
+from recipe.filters import MATCH_ALL, filter_by_related_ids
+from recipe.serializers import RecipeSerializer, RecipeValuesSerializer
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RecipeValuesSerializerTests(TestCase):
+    # Test RecipeValuesSerializer renders exactly what RecipeSerializer does
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.request = APIRequestFactory().get(RECIPES_URL)
+
+    def assertSameOutput(self, queryset, request=None):
+        context = {'request': request}
+        expected = RecipeSerializer(
+            queryset.with_related_ids(),
+            many=True,
+            context=context
+        ).data
+        actual = RecipeValuesSerializer(
+            queryset.values(*RecipeValuesSerializer.fields),
+            many=True,
+            context=context
+        ).data
+
+        self.assertEqual(actual, expected)
+        self.assertEqual(
+            JSONRenderer().render(actual),
+            JSONRenderer().render(expected)
+        )
+        return actual
+
+    def sample_recipe(self, **params):
+        defaults = {'title': 'Pancakes', 'time_minutes': 10, 'price': 5}
+        defaults.update(params)
+        return Recipe.objects.create(user=self.user, **defaults)
+
+    def test_fields_match(self):
+        # Test a field added to RecipeSerializer has to be added here too
+        self.sample_recipe()
+        data = self.assertSameOutput(Recipe.objects.all())
+
+        self.assertEqual(tuple(data[0]), RecipeSerializer.Meta.fields)
+
+    def test_empty(self):
+        # Test an empty list
+        self.assertEqual(self.assertSameOutput(Recipe.objects.all()), [])
+
+    def test_field_values(self):
+        # Test prices, unicode and empty values are rendered the same
+        self.sample_recipe(price=Decimal('0'), link='')
+        self.sample_recipe(price=Decimal('999.99'), link='https://a.b/c')
+        self.sample_recipe(
+            title='Crème brûlée \u2028 \u2603',
+            price=Decimal('5.1'),
+            time_minutes=0,
+            image_status=Recipe.IMAGE_PENDING
+        )
+
+        self.assertSameOutput(Recipe.objects.order_by('-id'))
+
+    def test_related_ids(self):
+        # Test tags and ingredients are listed in the same order
+        tags = [
+            Tag.objects.create(user=self.user, name=f'Tag {n}')
+            for n in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'Ingredient {n}')
+            for n in range(3)
+        ]
+        recipe1 = self.sample_recipe()
+        recipe1.tags.add(tags[2], tags[0])
+        recipe1.ingredients.add(ingredients[1])
+        recipe2 = self.sample_recipe()
+        recipe2.tags.add(tags[1])
+        self.sample_recipe()
+
+        self.assertSameOutput(Recipe.objects.order_by('-id'))
+        self.assertSameOutput(
+            filter_by_related_ids(
+                Recipe.objects.all(),
+                'tags',
+                [tags[0].id, tags[2].id],
+                MATCH_ALL
+            ).order_by('-id')
+        )
+
+    def test_image_srcset(self):
+        # Test the srcset of image variants, with and without a request
+        recipe = self.sample_recipe(image_status=Recipe.IMAGE_READY)
+        for size, fmt in [(512, 'webp'), (128, 'jpeg'), (128, 'webp')]:
+            RecipeImageVariant.objects.create(
+                recipe=recipe,
+                size=size,
+                format=fmt,
+                image=f'uploads/recipe/a_{size}.{fmt}',
+                width=size,
+                height=size // 2
+            )
+        self.sample_recipe()
+
+        self.assertSameOutput(Recipe.objects.order_by('-id'))
+        data = self.assertSameOutput(
+            Recipe.objects.order_by('-id'),
+            self.request
+        )
+        self.assertIn('http://testserver/', data[1]['image_srcset']['webp'])
+
+    def test_list_endpoint(self):
+        # Test the list endpoint returns RecipeSerializer's output
+        client = APIClient()
+        client.force_authenticate(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        for n in range(3):
+            self.sample_recipe(title=f'Recipe {n}').tags.add(tag)
+
+        res = client.get(RECIPES_URL, {'page_size': 2})
+        expected = RecipeSerializer(
+            Recipe.objects.with_related_ids().order_by('-id')[:2],
+            many=True,
+            context={'request': res.wsgi_request}
+        ).data
+
+        self.assertEqual(res.data['results'], expected)
+        self.assertEqual(
+            JSONRenderer().render(res.data['results']),
+            JSONRenderer().render(expected)
+        )
+
+    def test_browsable_api(self):
+        # Test the browsable API still gets a form for creating recipes
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.sample_recipe()
+
+        res = client.get(RECIPES_URL, HTTP_ACCEPT='text/html')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'name="time_minutes"')
@@ -1,18 +1,23 @@
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
+from django.utils.http import http_date
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Tag, Recipe
 
+from recipe.cache import get_version
 from recipe.serializers import TagSerializer
 
 
 # We wil use wiewsets. It automatically appends the action name to the end
 # of the name using the router.
 TAGS_URL = reverse('recipe:tag-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
 
 
 class PublicTagsApiTests(TestCase):
@@ -135,3 +140,273 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual((len(res.data)), 1)
+
+    def test_retrieve_tags_paginated(self):
+        # Test following the cursor returns every tag once, in order
+        for name in ('Vegan', 'Dessert', 'Breakfast', 'Lunch', 'Dinner'):
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        names = [tag['name'] for tag in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            self.assertLessEqual(len(res.data['results']), 2)
+            names.extend(tag['name'] for tag in res.data['results'])
+
+        self.assertEqual(
+            names,
+            ['Vegan', 'Lunch', 'Dinner', 'Dessert', 'Breakfast']
+        )
+
+    def test_retrieve_tags_page_size_capped(self):
+        # Test that the page size can't go above the server maximum
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL, {'page_size': 100000})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_bulk_create_tags(self):
+        # Test creating a batch of tags in one request
+        payload = [{'name': 'Vegan'}, {'name': 'Dessert'}]
+        res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 2)
+        names = Tag.objects.filter(user=self.user).values_list(
+            'name', flat=True
+        )
+        self.assertCountEqual(names, ['Vegan', 'Dessert'])
+
+    def test_bulk_create_tags_invalid(self):
+        # Test an invalid item fails the whole batch with per item errors
+        payload = [{'name': 'Vegan'}, {'name': ''}]
+        res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('name', res.data[1])
+        self.assertFalse(Tag.objects.filter(user=self.user).exists())
+
+    def test_bulk_create_tags_batch_size_limit(self):
+        # Test that batches above the maximum size are rejected
+        payload = [{'name': 'Tag'}] * 3
+        with self.settings(RECIPE_API_MAX_BATCH_SIZE=2):
+            res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Tag.objects.filter(user=self.user).exists())
+
+    def test_bulk_update_tags(self):
+        # Test renaming a batch of tags in one request
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dessert')
+        payload = [
+            {'id': tag1.id, 'name': 'Vegetarian'},
+            {'id': tag2.id, 'name': 'Sweets'},
+        ]
+        res = self.client.patch(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        tag1.refresh_from_db()
+        tag2.refresh_from_db()
+        self.assertEqual(tag1.name, 'Vegetarian')
+        self.assertEqual(tag2.name, 'Sweets')
+
+    def test_bulk_update_other_users_tag(self):
+        # Test that tags of other users can't be updated in bulk
+        user2 = get_user_model().objects.create_user(
+            'other@test.com',
+            'testpass'
+        )
+        tag = Tag.objects.create(user=user2, name='Fruity')
+        payload = [{'id': tag.id, 'name': 'Mine'}]
+        res = self.client.patch(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Fruity')
+
+    def test_create_tag_duplicate_name(self):
+        # Test a user can't create two tags with the same name
+        Tag.objects.create(user=self.user, name='Vegan')
+        res = self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_create_tags_duplicate_in_batch(self):
+        # Test a batch repeating a name is rejected
+        payload = [{'name': 'Vegan'}, {'name': 'Vegan'}]
+        res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Tag.objects.filter(user=self.user).exists())
+
+    def test_bulk_create_tags_existing_name(self):
+        # Test a batch reusing the name of an existing tag is rejected,
+        # with one query for the whole batch
+        Tag.objects.create(user=self.user, name='Vegan')
+        payload = [{'name': f'Tag {n}'} for n in range(50)]
+        with self.assertNumQueries(1):
+            res = self.client.post(
+                TAGS_BULK_URL,
+                payload + [{'name': 'Vegan'}],
+                format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Vegan', res.data['non_field_errors'][0])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_update_tags_unchanged_name(self):
+        # Test items of a batch can send their own unchanged name
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dessert')
+        payload = [
+            {'id': tag1.id, 'name': 'Vegan'},
+            {'id': tag2.id, 'name': 'Sweets'},
+        ]
+        res = self.client.patch(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        tag2.refresh_from_db()
+        self.assertEqual(tag2.name, 'Sweets')
+
+        payload = [{'id': tag2.id, 'name': 'Vegan'}]
+        res = self.client.patch(TAGS_BULK_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_tags_not_modified(self):
+        # Test a repeated request with the ETag gets 304 Not Modified
+        Tag.objects.create(user=self.user, name='Vegan')
+        res = self.client.get(TAGS_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_retrieve_tags_etag_changes(self):
+        # Test creating, renaming and deleting a tag changes the ETag
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        etags = [self.client.get(TAGS_URL)['ETag']]
+
+        Tag.objects.create(user=self.user, name='Dessert')
+        etags.append(self.client.get(TAGS_URL)['ETag'])
+        tag.name = 'Vegetarian'
+        tag.save()
+        etags.append(self.client.get(TAGS_URL)['ETag'])
+        tag.delete()
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etags[-1])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        etags.append(res['ETag'])
+        self.assertEqual(len(set(etags)), 4)
+
+    def test_retrieve_tags_modified_since_delete(self):
+        # Test deleting the newest tag makes If-Modified-Since requests
+        # get the list again, though no remaining tag was updated
+        Tag.objects.create(user=self.user, name='Vegan')
+        tag = Tag.objects.create(user=self.user, name='Dessert')
+        res = self.client.get(TAGS_URL)
+        last_modified = res['Last-Modified']
+
+        # A minute later, Last-Modified only has whole seconds.
+        later_ms = (get_version(self.user.pk) // 1000 + 60) * 1000
+        with patch('recipe.cache._now_ms', return_value=later_ms):
+            tag.delete()
+        res = self.client.get(
+            TAGS_URL,
+            HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['name'] for tag in res.data], ['Vegan'])
+        self.assertEqual(res['Last-Modified'], http_date(later_ms // 1000))
+
+    def test_retrieve_tags_assigned_etag_changes(self):
+        # Test assigning a tag to a recipe changes the assigned_only ETag
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        recipe = Recipe.objects.create(
+            title='Eggs',
+            time_minutes=5,
+            price=2.00,
+            user=self.user
+        )
+        etag = self.client.get(TAGS_URL, {'assigned_only': 1})['ETag']
+        recipe.tags.add(tag)
+        res = self.client.get(
+            TAGS_URL,
+            {'assigned_only': 1},
+            HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_retrieve_tags_assigned_etag_changes_on_swap(self):
+        # Test swapping one assigned tag for another changes the ETag,
+        # though the number of assigned tags stays the same
+        tag_x = Tag.objects.create(user=self.user, name='X')
+        tag_y = Tag.objects.create(user=self.user, name='Y')
+        tag_z = Tag.objects.create(user=self.user, name='Z')
+        recipe = Recipe.objects.create(
+            title='Eggs',
+            time_minutes=5,
+            price=2.00,
+            user=self.user
+        )
+        recipe.tags.add(tag_z, tag_x)
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(
+            [tag['name'] for tag in res.data], ['Z', 'X']
+        )
+
+        recipe.tags.remove(tag_x)
+        recipe.tags.add(tag_y)
+        res = self.client.get(
+            TAGS_URL,
+            {'assigned_only': 1},
+            HTTP_IF_NONE_MATCH=res['ETag']
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag['name'] for tag in res.data], ['Z', 'Y']
+        )
+
+    def test_retrieve_tags_typeahead_etag_changes_on_usage(self):
+        # Test the typeahead ETag changes when the usage ranking does
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Vegetarian')
+        recipe = Recipe.objects.create(
+            title='Salad',
+            time_minutes=5,
+            price=2.00,
+            user=self.user
+        )
+        recipe.tags.add(tag1)
+        etag = self.client.get(TAGS_URL, {'q': 'veg'})['ETag']
+
+        recipe.tags.set([tag2])
+        res = self.client.get(TAGS_URL, {'q': 'veg'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_tags_typeahead(self):
+        # Test the q parameter also works for tags
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Vegetarian')
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        res = self.client.get(TAGS_URL, {'q': 'veg', 'limit': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertTrue(res.data[0]['name'].startswith('Veg'))
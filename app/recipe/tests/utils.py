@@ -0,0 +1,25 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    # TestCase mixin for checking that an endpoint doesn't run one query
+    # per row (the N+1 problem).
+
+    def assertConstantQueries(self, add_rows, fetch, sizes=(1, 10)):
+        # add_rows(n) creates n more rows, fetch() performs the request.
+        # fetch() is run after each batch of rows is added and it has to
+        # run the same number of queries every time, no matter how many
+        # rows there are.
+        counts = []
+        for size in sizes:
+            add_rows(size)
+            with CaptureQueriesContext(connection) as ctx:
+                fetch()
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(
+            len(set(counts)), 1,
+            f'Query count grew with the number of rows: {counts}'
+        )
+        return counts[0]
@@ -1,25 +1,145 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
+
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 # the action decorator is what you use to add custom actions to your viewset.
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Tag, Ingredient, Recipe
+from core.authentication import CachedTokenAuthentication
+from core.models import Tag, Ingredient, Recipe, ImageJob
 
 from recipe import serializers
+from recipe.cache import bump_version, get_version, CachedResponseMixin
+from recipe.conditional import ConditionalResponseMixin
+from recipe.filters import filter_assigned, filter_by_related_ids, \
+                           filter_ranges, filter_typeahead, parse_ordering, \
+                           recipes_field, MATCH_ANY
+from recipe.pagination import RecipeAttrCursorPagination, \
+                              RecipeCursorPagination
+from recipe.search import search_recipes, search_terms
+
 
 
+class BulkMixin:
+    # Adds a bulk/ endpoint to a viewset for creating (POST) or partially
+    # updating (PATCH) a list of objects in one request.
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+    def _bulk_error(self, message):
+        return Response(
+            {'non_field_errors': [message]},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(methods=['POST', 'PATCH'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        # Create or update a batch of objects in one transaction
+        items = request.data
+        if not isinstance(items, list):
+            return self._bulk_error('Expected a list of items.')
+        if len(items) > settings.RECIPE_API_MAX_BATCH_SIZE:
+            return self._bulk_error(
+                'Batches are limited to '
+                f'{settings.RECIPE_API_MAX_BATCH_SIZE} items.'
+            )
+
+        if request.method == 'POST':
+            serializer = self.get_serializer(data=items, many=True)
+            save_kwargs = {'user': request.user}
+            success_status = status.HTTP_201_CREATED
+        else:
+            instances, errors = self._get_bulk_instances(items)
+            if any(errors):
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            serializer = self.get_serializer(
+                instances,
+                data=items,
+                many=True,
+                partial=True
+            )
+            save_kwargs = {}
+            success_status = status.HTTP_200_OK
+
+        if serializer.is_valid():
+            try:
+                serializer.save(**save_kwargs)
+            except IntegrityError:
+                # e.g. items of the batch swapping names with each other,
+                # which can't be caught one item at a time.
+                return self._bulk_error(
+                    'The batch conflicts with existing objects.'
+                )
+            # Bulk writes don't send the model signals that normally
+            # invalidate the user's cached responses.
+            bump_version(request.user.pk)
+            return Response(serializer.data, status=success_status)
+
+        # serializer.errors is a list with the errors of each item, in the
+        # same order as the items that were sent.
+        return Response(
+            serializer.errors,
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    def _get_bulk_instances(self, items):
+        # Fetch the user's objects for a list of items by their id, along
+        # with a list of per item errors for the ids that weren't found.
+        ids = [item.get('id') if isinstance(item, dict) else None
+               for item in items]
+        found = self.queryset.filter(
+            user=self.request.user,
+            id__in=[pk for pk in ids if isinstance(pk, int)]
+        ).in_bulk()
+
+        instances = [found.get(pk) for pk in ids]
+        errors = [
+            {} if instance is not None else {'id': ['Object not found.']}
+            for instance in instances
+        ]
+
+        return instances, errors
+
+
+class BaseRecipeAttrViewSet(BulkMixin,
+                            ConditionalResponseMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     # Base viewset for user owned recipe attributes.
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttrCursorPagination
+    # Number of typeahead (q/prefix) results returned by default, and the
+    # most a client can ask for with limit.
+    typeahead_limit = 10
+    max_typeahead_limit = 50
 
-    def get_queryset(self):
-        # Return objects for the current authenticated user only
+    def _typeahead_params(self):
+        # Return the typeahead text and whether it's a prefix, if any
+        params = self.request.query_params
+        if params.get('prefix'):
+            return params['prefix'], True
+
+        return params.get('q'), False
+
+    def _typeahead_limit(self):
+        limit = self.request.query_params.get('limit', self.typeahead_limit)
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= self.max_typeahead_limit:
+            raise ValidationError({'limit': [
+                f'Expected a number from 1 to {self.max_typeahead_limit}.'
+            ]})
+
+        return limit
+
+    def _assigned_only(self):
+        # Whether only the objects assigned to recipes are asked for
         '''
         Note
         Our assigned_only value will be a 0 or a 1. In the query_params
@@ -30,18 +150,62 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
         convert to true and assigned_only evaluates to true even if it
         was originally a 0.
         '''
-        assigned_only = bool(
+        return bool(
             # 0 is passed in as a default value for assigned_only if
             # not provided.
             int(self.request.query_params.get('assigned_only', 0))
         )
+
+    def get_response_state(self, request):
+        # Which objects are assigned and how the typeahead ranks them
+        # depend on the recipes' links, which change without changing the
+        # objects themselves, so the links are part of the state too.
+        state, _ = super().get_response_state(request)
+        # The newest updated_at doesn't move when an object or a link is
+        # deleted, the user's cache version is the time of any change.
+        last_modified = get_version(request.user.pk) // 1000
+        text, _ = self._typeahead_params()
+        if not (text or self._assigned_only()):
+            return state, last_modified
+
+        through = recipes_field(self.queryset).remote_field.through
+        links = through.objects.filter(recipe__user=request.user).aggregate(
+            count=Count('pk'),
+            last_id=Max('pk')
+        )
+        return f'{state}:{links["count"]}:{links["last_id"]}', last_modified
+
+    def get_queryset(self):
+        # Return objects for the current authenticated user only
         queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+        if self._assigned_only():
+            queryset = filter_assigned(queryset)
+
+        # No join is made, so each object comes back once without needing
+        # distinct().
+        queryset = queryset.filter(user=self.request.user)
+        # q (names containing the text) and prefix (names starting with it)
+        # are for typeahead, ranked best match first.
+        text, prefix = self._typeahead_params()
+        if text:
+            return filter_typeahead(queryset, text, prefix)
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
+        return queryset.order_by('-name', 'id')
+
+    def list(self, request, *args, **kwargs):
+        # Typeahead requests get the top results instead of pages
+        text, _ = self._typeahead_params()
+        if not text:
+            return super().list(request, *args, **kwargs)
+
+        limit = self._typeahead_limit()
+        return self._conditional_response(
+            request,
+            lambda request: Response(self.get_serializer(
+                self.get_queryset()[:limit],
+                many=True
+            ).data)
+        )
 
     def perform_create(self, serializer):
         # Create a new object
@@ -64,12 +228,13 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(BulkMixin, CachedResponseMixin, viewsets.ModelViewSet):
     # Manage recipes in the database
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeCursorPagination
 
     def _params_to_ints(self, qs):
         # _ before function is python convention for a private function
@@ -81,22 +246,59 @@ class RecipeViewSet(viewsets.ModelViewSet):
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
         queryset = self.queryset
+        # tags_match/ingredients_match choose whether a recipe needs to have
+        # any (the default) or all of the requested tags/ingredients.
         if tags:
             tag_ids = self._params_to_ints(tags)
-            # Double underscure (__) is the Django syntax for filtering
-            # on foreign key objects. We have a tags field in our
-            # recipe queryset and that has a foreign key to our tags table
-            # Another __ before a function 'in' which says to return
-            # all of the tags where the id is in this list provided.
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = filter_by_related_ids(
+                queryset,
+                'tags',
+                tag_ids,
+                self.request.query_params.get('tags_match', MATCH_ANY)
+            )
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = filter_by_related_ids(
+                queryset,
+                'ingredients',
+                ingredient_ids,
+                self.request.query_params.get('ingredients_match', MATCH_ANY)
+            )
+
+        # min_time, max_time and max_price are compared with the recipe's
+        # own columns, covered by the (user_id, time_minutes) and
+        # (user_id, price) indexes.
+        queryset = filter_ranges(queryset, self.request.query_params)
+
+        # search matches the words (as prefixes) against the title and the
+        # tag and ingredient names, best matches first unless ordering is
+        # given.
+        terms = search_terms(self.request.query_params.get('search', ''))
+        ordering = ('-id',)
+        if terms:
+            queryset = search_recipes(queryset, terms)
+            ordering = ('-search_rank', '-id')
+        if self.request.query_params.get('ordering'):
+            ordering = parse_ordering(self.request.query_params['ordering'])
+        self.pagination_ordering = ordering
+
+        # Load the related tags and ingredients in one query each instead of
+        # one query per recipe. List is rendered from plain rows (see
+        # get_serializer), retrieve needs the tags' and ingredients' names
+        # too for the nested serializers.
+        if self.action == 'list':
+            fields = serializers.RecipeValuesSerializer.fields
+            if terms:
+                # The cursor pagination reads the rank from the rows.
+                fields += ('search_rank',)
+            queryset = queryset.values(*fields)
+        elif self.action == 'retrieve':
+            queryset = queryset.with_related_names()
 
         # Since we applied new parameters to our queryset it was changed
         # and reassigned to the variable 'queryset' so we no longer return
         # self.queryset but just return queryset
-        return queryset.filter(user=self.request.user)
+        return queryset.filter(user=self.request.user).order_by(*ordering)
 
     def get_serializer_class(self):
         # Return appropriate serializer class.
@@ -112,10 +314,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if self.action == 'retrieve':
             return serializers.RecipeDetailSerializer
         elif self.action == 'upload_image':
-            return serializers.RecipeImageSerializer
+            return serializers.RecipeImageUploadSerializer
 
         return self.serializer_class
 
+    def get_serializer(self, *args, **kwargs):
+        # Render the list with the lightweight RecipeValuesSerializer. Other
+        # callers, like the browsable API's form, get the real serializer.
+        if self.action == 'list' and kwargs.get('many'):
+            return serializers.RecipeValuesSerializer(
+                *args,
+                context=self.get_serializer_context(),
+                **kwargs
+            )
+
+        return super().get_serializer(*args, **kwargs)
+
     def perform_create(self, serializer):
         # Create a new recipe
         serializer.save(user=self.request.user)
@@ -123,17 +337,30 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         # Upload an image to a recipe
+        '''
+        Note
+        The upload is only written to the staging area here and the request
+        is answered right away with 202 Accepted. Decoding, stripping EXIF
+        and downscaling is done by the process_recipe_images command, the
+        recipe's image_status tells when the image is ready.
+        '''
         recipe = self.get_object()
-        serializer = self.get_serializer(
-            recipe,
-            data=request.data
-        )
+        serializer = self.get_serializer(data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                ImageJob.objects.create(
+                    recipe=recipe,
+                    staged_image=serializer.validated_data['image']
+                )
+                recipe.image_status = Recipe.IMAGE_PENDING
+                recipe.save(update_fields=['image_status', 'updated_at'])
             return Response(
-                serializer.data,
-                status=status.HTTP_200_OK
+                serializers.RecipeImageSerializer(
+                    recipe,
+                    context=self.get_serializer_context()
+                ).data,
+                status=status.HTTP_202_ACCEPTED
             )
 
         return Response(
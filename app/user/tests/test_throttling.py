@@ -0,0 +1,96 @@
+import os
+import runpy
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from core.models import ThrottleBucket
+from user.throttling import DatabaseBucketStore, MemoryBucketStore, \
+                            _build_bucket_store, parse_rate
+
+
+class BucketStoreTests(TestCase):
+
+    def _test_store(self, store):
+        # A bucket of 2 refilling at one token a second
+        self.assertIsNone(store.consume('a', 2, 1, now=100))
+        self.assertIsNone(store.consume('a', 2, 1, now=100))
+        self.assertEqual(store.consume('a', 2, 1, now=100), 1)
+        # Another key has its own bucket.
+        self.assertIsNone(store.consume('b', 2, 1, now=100))
+        # Half a token has come back, the rejected request took nothing.
+        self.assertEqual(store.consume('a', 2, 1, now=100.5), 0.5)
+        self.assertIsNone(store.consume('a', 2, 1, now=101))
+        # The bucket never holds more than its capacity.
+        for _ in range(2):
+            self.assertIsNone(store.consume('a', 2, 1, now=1000))
+        self.assertIsNotNone(store.consume('a', 2, 1, now=1000))
+
+    def test_memory_store(self):
+        self._test_store(MemoryBucketStore(max_size=10))
+
+    def test_database_store(self):
+        # Never pruned, to count the buckets
+        store = DatabaseBucketStore(prune_interval=float('inf'))
+        self._test_store(store)
+
+        self.assertEqual(ThrottleBucket.objects.count(), 2)
+        store.clear()
+        self.assertEqual(ThrottleBucket.objects.count(), 0)
+
+    def test_database_store_prunes_full_buckets(self):
+        # Test the buckets that filled up again are deleted, without
+        # changing what the next requests are allowed
+        store = DatabaseBucketStore(prune_interval=10)
+        store.consume('a', 2, 1, now=100)
+        store.consume('b', 2, 1, now=100)
+        store.consume('b', 2, 1, now=100)
+
+        # a is full again at 101, b at 102, the prune waits until 110.
+        store.consume('c', 2, 1, now=105)
+        self.assertEqual(ThrottleBucket.objects.count(), 3)
+        store.consume('c', 2, 1, now=110)
+        self.assertEqual(
+            list(ThrottleBucket.objects.values_list('key', flat=True)),
+            ['c']
+        )
+
+        self.assertEqual(store.prune(now=1000), 1)
+        self.assertFalse(ThrottleBucket.objects.exists())
+
+    def test_memory_store_max_size(self):
+        # Test the least recently used buckets are dropped
+        store = MemoryBucketStore(max_size=2)
+        store.consume('a', 1, 1, now=0)
+        store.consume('b', 1, 1, now=0)
+        store.consume('a', 1, 1, now=0)
+        store.consume('c', 1, 1, now=0)
+
+        self.assertIsNone(store.consume('b', 1, 1, now=0))
+        self.assertIsNotNone(store.consume('c', 1, 1, now=0))
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/min'), 10 / 60)
+        self.assertEqual(parse_rate('2/sec'), 2)
+
+    def test_store_defaults_to_database_without_debug(self):
+        # Test the buckets are only kept per process in development
+        path = os.path.join(settings.BASE_DIR, 'app', 'settings.py')
+        env = {
+            'DJANGO_DEBUG': '0',
+            'API_CACHE_BACKEND':
+                'django.core.cache.backends.filebased.FileBasedCache',
+        }
+        with patch.dict(os.environ, env):
+            os.environ.pop('LOGIN_THROTTLE_STORE', None)
+            config = runpy.run_path(path)['LOGIN_THROTTLE']
+        self.assertEqual(config['STORE'], 'database')
+        with override_settings(LOGIN_THROTTLE=config):
+            self.assertIsInstance(_build_bucket_store(), DatabaseBucketStore)
+
+        env['DJANGO_DEBUG'] = '1'
+        with patch.dict(os.environ, env):
+            os.environ.pop('LOGIN_THROTTLE_STORE', None)
+            config = runpy.run_path(path)['LOGIN_THROTTLE']
+        self.assertEqual(config['STORE'], 'memory')
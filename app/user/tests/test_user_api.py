@@ -1,16 +1,31 @@
-from django.test import TestCase
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.urls import reverse
 
 # REST framework test helper tools
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from user.throttling import DatabaseBucketStore, bucket_store
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
 
+# Small buckets that barely refill while a test runs.
+THROTTLE = {
+    'ENABLED': True,
+    'IP_BURST': 3,
+    'IP_RATE': '1/day',
+    'ACCOUNT_BURST': 2,
+    'ACCOUNT_RATE': '1/day',
+}
+
+
 def create_user(**params):
     return get_user_model().objects.create_user(**params)
 
@@ -23,6 +38,7 @@ class PublicUserApiTests(TestCase):
         # Makes it easier to call client. We don't need to constantly
         # recreate the APIClient so we can reuse it.
         self.client = APIClient()
+        bucket_store.clear()
 
     def test_create_valid_user_success(self):
         # Test creating user with valid payload(object) is successful.
@@ -111,6 +127,88 @@ class PublicUserApiTests(TestCase):
         self.assertNotIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_token_upgrades_password_hash(self):
+        # Test the stored hash is upgraded to the preferred hasher and
+        # iterations when the user logs in
+        user = create_user(email='test@test.com', password='testpass')
+        user.password = make_password('testpass', hasher='pbkdf2_sha1')
+        user.save()
+        payload = {'email': 'test@test.com', 'password': 'testpass'}
+
+        res = self.client.post(TOKEN_URL, payload)
+        user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            res = self.client.post(TOKEN_URL, payload)
+        user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_create_token_throttled_by_ip(self):
+        # Test a burst from one address is rejected before any password
+        # is hashed
+        with override_settings(LOGIN_THROTTLE=THROTTLE):
+            for n in range(3):
+                self.client.post(TOKEN_URL, {
+                    'email': f'user{n}@test.com', 'password': 'wrong'
+                })
+            with patch('user.serializers.authenticate',
+                       return_value=None) as authenticate:
+                res = self.client.post(TOKEN_URL, {
+                    'email': 'test@test.com', 'password': 'testpass'
+                })
+                other = self.client.post(TOKEN_URL, {
+                    'email': 'test@test.com', 'password': 'testpass'
+                }, REMOTE_ADDR='10.0.0.2')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(authenticate.call_count, 1)
+
+    def test_create_token_list_body(self):
+        # Test a body that isn't an object is rejected as invalid
+        with override_settings(LOGIN_THROTTLE=THROTTLE):
+            res = self.client.post(TOKEN_URL, [{
+                'email': 'test@test.com', 'password': 'testpass'
+            }], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_token_long_email_throttled(self):
+        # Test emails longer than the bucket keys get their own bucket
+        email = 'a' * 300 + '@test.com'
+        config = dict(THROTTLE, STORE='database')
+        with override_settings(LOGIN_THROTTLE=config), \
+                patch('user.throttling.bucket_store', DatabaseBucketStore()):
+            for _ in range(2):
+                self.client.post(TOKEN_URL, {
+                    'email': email, 'password': 'wrong'
+                }, REMOTE_ADDR='10.0.0.1')
+            res = self.client.post(TOKEN_URL, {
+                'email': email, 'password': 'wrong'
+            }, REMOTE_ADDR='10.0.0.2')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_create_token_throttled_by_account(self):
+        # Test a burst for one account is rejected whichever addresses it
+        # comes from
+        create_user(email='test@test.com', password='testpass')
+        with override_settings(LOGIN_THROTTLE=THROTTLE):
+            for n in range(2):
+                self.client.post(TOKEN_URL, {
+                    'email': 'test@test.com', 'password': 'wrong'
+                }, REMOTE_ADDR=f'10.0.0.{n}')
+            res = self.client.post(TOKEN_URL, {
+                'email': 'TEST@test.com', 'password': 'testpass'
+            }, REMOTE_ADDR='10.0.1.1')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertNotIn('token', res.data)
+
     def test_retrieve_user_unauthorized(self):
         # Test that authentication is required for users.
         res = self.client.get(ME_URL)
@@ -0,0 +1,179 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from rest_framework.throttling import BaseThrottle
+
+from core.models import ThrottleBucket
+
+
+# Longest bucket key that fits in ThrottleBucket.key.
+KEY_LENGTH = ThrottleBucket._meta.get_field('key').max_length
+
+# Seconds in each of the periods a throttle rate can be given in.
+PERIODS = {'sec': 1, 'min': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate):
+    # Turn '<requests>/<period>' into requests per second
+    requests, period = rate.split('/')
+    return int(requests) / PERIODS[period]
+
+
+def take_token(tokens, updated_at, capacity, rate, now):
+    # Refill a bucket for the time since it was updated and take a token
+    # out of it. Returns (tokens left, seconds until a token is available
+    # or None if one was taken).
+    tokens = min(capacity, tokens + (now - updated_at) * rate)
+    if tokens >= 1:
+        return tokens - 1, None
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBucketStore:
+    # Token buckets kept in this process, the least recently used ones
+    # being dropped once there are more than max_size.
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, now=None):
+        # Take a token from the bucket for key. Returns the seconds to wait
+        # before trying again, or None if the request is allowed.
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens, wait = take_token(tokens, updated_at, capacity, rate, now)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class DatabaseBucketStore:
+    # Token buckets stored in the ThrottleBucket table, so every process
+    # serving the API shares them. Every prune_interval seconds a consume()
+    # also deletes the buckets that filled up again, which would otherwise
+    # pile up for every address and email ever throttled.
+
+    def __init__(self, prune_interval=60):
+        self.prune_interval = prune_interval
+        self._pruned_at = 0
+
+    def consume(self, key, capacity, rate, now=None):
+        now = time.time() if now is None else now
+        with transaction.atomic():
+            # The row lock makes concurrent requests take turns.
+            bucket, _ = ThrottleBucket.objects.select_for_update() \
+                .get_or_create(
+                    key=key,
+                    defaults={
+                        'tokens': capacity,
+                        'updated_at': now,
+                        'full_at': now,
+                    }
+                )
+            bucket.tokens, wait = take_token(
+                bucket.tokens, bucket.updated_at, capacity, rate, now
+            )
+            bucket.updated_at = now
+            bucket.full_at = now + (capacity - bucket.tokens) / rate
+            bucket.save(update_fields=['tokens', 'updated_at', 'full_at'])
+
+        if now - self._pruned_at >= self.prune_interval:
+            self._pruned_at = now
+            self.prune(now)
+
+        return wait
+
+    def prune(self, now=None):
+        # Delete the full buckets, a missing bucket starts out full anyway.
+        # Returns the number of buckets deleted.
+        now = time.time() if now is None else now
+        deleted, _ = ThrottleBucket.objects.filter(full_at__lte=now).delete()
+        return deleted
+
+    def clear(self):
+        ThrottleBucket.objects.all().delete()
+
+
+def _build_bucket_store():
+    # Build the bucket store from the LOGIN_THROTTLE setting
+    config = getattr(settings, 'LOGIN_THROTTLE', {})
+    if config.get('STORE') == 'database':
+        return DatabaseBucketStore()
+
+    return MemoryBucketStore(config.get('MAX_SIZE', 100000))
+
+
+bucket_store = _build_bucket_store()
+
+
+class LoginThrottle(BaseThrottle):
+    # Throttles requests with a token bucket per key (see get_key), sized
+    # by the LOGIN_THROTTLE setting. Throttles run before the view, so a
+    # rejected request never gets to hash a password.
+    scope = None
+
+    def __init__(self):
+        self.config = getattr(settings, 'LOGIN_THROTTLE', {})
+        self._wait = None
+
+    def get_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        if not self.config.get('ENABLED', True):
+            return True
+        key = self.get_key(request)
+        if key is None:
+            return True
+        key = f'login:{self.scope}:{key}'
+        if len(key) > KEY_LENGTH:
+            # Keep long (made up) emails within the ThrottleBucket key.
+            digest = hashlib.sha256(key.encode()).hexdigest()
+            key = f'login:{self.scope}:{digest}'
+        self._wait = bucket_store.consume(
+            key,
+            self.config[f'{self.scope.upper()}_BURST'],
+            parse_rate(self.config[f'{self.scope.upper()}_RATE'])
+        )
+        return self._wait is None
+
+    def wait(self):
+        return self._wait
+
+
+class LoginIPThrottle(LoginThrottle):
+    # One bucket per client address
+    scope = 'ip'
+
+    def get_key(self, request):
+        return self.get_ident(request)
+
+
+class LoginAccountThrottle(LoginThrottle):
+    # One bucket per email address, whoever the requests come from
+    scope = 'account'
+
+    def get_key(self, request):
+        if not isinstance(request.data, dict):
+            # e.g. a JSON list, which the serializer rejects.
+            return None
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email:
+            # The serializer rejects the request without hashing anything.
+            return None
+        return email.strip().lower()
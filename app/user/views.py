@@ -1,8 +1,10 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.authentication import CachedTokenAuthentication
 from user.serializers import UserSerializer, AuthTokenSerializer
+from user.throttling import LoginIPThrottle, LoginAccountThrottle
 
 
 # Django REST Framework APIView documentation -
@@ -21,12 +23,15 @@ class CreateTokenView(ObtainAuthToken):
     # Set our renderer class. This allows us to view this endpoint
     # in the browser with the browsable API.
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # Reject bursts from one address or for one account before the
+    # serializer hashes the password.
+    throttle_classes = (LoginIPThrottle, LoginAccountThrottle)
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     # Manage the authenticated user
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):